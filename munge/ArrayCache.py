@@ -0,0 +1,169 @@
+"""Class to persist decoded arrays on disk so that they don't have to be recomputed in every run"""
+import glob
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+# once the cache is full it is shrunk below its limit, so that the next writes don't have to evict again
+EVICTION_RATIO = 0.9
+
+class ArrayCache(object):
+    """
+    ArrayCache class can be instantiated with the following args. Entries are keyed by the full path of the source file
+    along with its modification time and size, so an entry becomes stale as soon as its source file changes. When the
+    cache grows beyond ``max_size`` the least recently used entries are evicted until it is ``EVICTION_RATIO`` of
+    ``max_size``. The size of the cache is tracked as entries are written, the directory is only scanned to evict.
+
+    - **parameters**, **types**, **return** and **return types**::
+    :param cache_dir: directory in which the cached arrays are stored
+    :param max_size: maximum size of the cache in bytes. ``None`` for no limit
+    :type cache_dir: string
+    :type max_size: int
+    """
+    def __init__(self, cache_dir, max_size=None):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._size = None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get(self, path, tag):
+        """
+        Gets the arrays cached for the given source file
+
+        :param path: path of the source file
+        :param tag: name of the cached representation of the file, ex: ``'dicom'``
+        :return: Dict of arrays or ``None`` if there is no entry for the current version of the file
+        """
+        entry_path = self._get_entry_path(path, tag)
+
+        try:
+            with np.load(entry_path) as entry:
+                arrays = {name: entry[name] for name in entry.files}
+        except (IOError, ValueError):
+            return None
+
+        # the modification time of an entry is its last access time, which is what eviction goes by
+        os.utime(entry_path)
+        return arrays
+
+    def put(self, path, tag, arrays):
+        """
+        Caches the arrays for the given source file, replacing the entries of its older versions
+
+        :param path: path of the source file
+        :param tag: name of the cached representation of the file, ex: ``'dicom'``
+        :param arrays: Dict of arrays to cache
+        """
+        entry_path = self._get_entry_path(path, tag)
+        removed_size = self._remove_entries(self._get_entry_prefix(path, tag))
+
+        # write to a temporary file first so that other processes never read a partially written entry
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='.tmp', delete=False) as tmp_file:
+            np.savez(tmp_file, **arrays)
+        os.replace(tmp_file.name, entry_path)
+
+        if self.max_size is not None:
+            if self._size is None:
+                self._size = self.size()
+            else:
+                self._size += os.stat(entry_path).st_size - removed_size
+
+            # other processes sharing the directory are not counted, eviction goes by the actual size again
+            if self._size > self.max_size:
+                self.evict(int(self.max_size * EVICTION_RATIO))
+
+    def fetch(self, path, tag, compute):
+        """
+        Gets the arrays cached for the given source file and computes and caches them if there is no entry
+
+        :param path: path of the source file
+        :param tag: name of the cached representation of the file, ex: ``'dicom'``
+        :param compute: function with no arguments returning the Dict of arrays to cache, or ``None`` if nothing
+            should be cached
+        :return: Dict of arrays
+        """
+        arrays = self.get(path, tag)
+
+        if arrays is None:
+            arrays = compute()
+            if arrays is not None:
+                self.put(path, tag, arrays)
+
+        return arrays
+
+    def invalidate(self, path=None):
+        """
+        Removes the entries of the given source file, or every entry if no file is given
+
+        :param path: path of the source file
+        """
+        prefix = hashlib.sha1(os.path.abspath(path).encode()).hexdigest() if path else ''
+        removed_size = self._remove_entries(prefix)
+
+        if self._size is not None:
+            self._size = max(self._size - removed_size, 0)
+
+    def size(self):
+        """
+        Gets the total size of the entries in the cache
+
+        :return: size in bytes
+        """
+        return sum(entry.stat().st_size for entry in self._get_entries())
+
+    def evict(self, max_size):
+        """
+        Removes the least recently used entries until the cache is not larger than ``max_size``
+
+        :param max_size: size in bytes to shrink the cache to
+        """
+        entries = [(entry.stat().st_mtime_ns, entry.stat().st_size, entry.path) for entry in self._get_entries()]
+        entries.sort()
+
+        total_size = sum(entry[1] for entry in entries)
+
+        for _, entry_size, entry_path in entries:
+            if total_size <= max_size:
+                break
+
+            self._remove(entry_path)
+            total_size -= entry_size
+
+        self._size = total_size
+
+    def _get_entry_prefix(self, path, tag):
+        path_hash = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+        return '{}.{}.'.format(path_hash, tag)
+
+    def _get_entry_path(self, path, tag):
+        stat = os.stat(path)
+        version = hashlib.sha1('{}:{}'.format(stat.st_mtime_ns, stat.st_size).encode()).hexdigest()
+
+        return os.path.join(self.cache_dir, '{}{}.npz'.format(self._get_entry_prefix(path, tag), version))
+
+    def _get_entries(self):
+        return (entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.npz'))
+
+    def _remove_entries(self, prefix):
+        """
+        Removes the entries whose name starts with the given prefix, only listing the matching files
+
+        :return: total size of the removed entries in bytes
+        """
+        removed_size = 0
+        for entry_path in glob.glob(os.path.join(self.cache_dir, glob.escape(prefix) + '*.npz')):
+            removed_size += self._remove(entry_path)
+        return removed_size
+
+    @staticmethod
+    def _remove(entry_path):
+        # another process might have removed the entry already
+        try:
+            entry_size = os.stat(entry_path).st_size
+            os.remove(entry_path)
+        except FileNotFoundError:
+            return 0
+        return entry_size
@@ -0,0 +1,184 @@
+"""Class to represent a boolean mask by the bitmap of its bounding box"""
+import numpy as np
+
+from .utils import contour
+
+class CroppedMask(object):
+    """
+    CroppedMask class can be instantiated with the following args. Only the bitmap of the bounding box of the mask is
+    stored, so a ROI covering a small part of the image takes a small part of the memory. The full mask is only
+    expanded when ``toarray`` is called, and ``crop`` and ``values`` let the callers work inside the bounding box.
+
+    - **parameters**, **types**, **return** and **return types**::
+    :param offset: (row, column) of the top left corner of the bounding box in the full mask
+    :param bitmap: boolean array with the mask inside the bounding box
+    :param shape: (height, width) of the full mask
+    :param packed: if ``True`` the bitmap is stored bit-packed with ``np.packbits``, taking 8 times less memory
+    :type offset: tuple
+    :type bitmap: numpy.ndarray
+    :type shape: tuple
+    :type packed: bool
+    """
+    def __init__(self, offset, bitmap, shape, packed=False):
+        self.offset = tuple(int(o) for o in offset)
+        self.shape = tuple(int(s) for s in shape)
+        self.bitmap_shape = tuple(bitmap.shape)
+        self.packed = packed
+
+        bitmap = np.asarray(bitmap, dtype=bool)
+        self._bitmap = np.packbits(bitmap, axis=None) if packed else np.ascontiguousarray(bitmap)
+
+    @staticmethod
+    def from_dense(mask, packed=False):
+        """
+        Creates the ``CroppedMask`` of the given full size mask, cropped to the rows and columns having set pixels
+
+        :param mask: boolean array of shape (height, width)
+        :param packed: whether to bit-pack the bitmap
+        :return: instance of ``CroppedMask``
+        """
+        rows = np.flatnonzero(mask.any(axis=1))
+        columns = np.flatnonzero(mask.any(axis=0))
+
+        if not len(rows):
+            return CroppedMask((0, 0), np.zeros((0, 0), dtype=bool), mask.shape, packed)
+
+        top, bottom, left, right = rows[0], rows[-1] + 1, columns[0], columns[-1] + 1
+        return CroppedMask((top, left), mask[top:bottom, left:right], mask.shape, packed)
+
+    @staticmethod
+    def from_polygon(polygon, width, height, packed=False):
+        """
+        Rasterizes the given polygon (see ``contour.poly_to_mask``) into a bitmap of its bounding box only
+
+        :param polygon: array of shape (N, 2) or list of pairs of x, y coords in units of pixels
+        :param width: scalar image width
+        :param height: scalar image height
+        :param packed: whether to bit-pack the bitmap
+        :return: instance of ``CroppedMask``
+        """
+        offset, bitmap = contour.poly_to_cropped_mask(polygon, width, height)
+        return CroppedMask(offset, bitmap, (height, width), packed)
+
+    @staticmethod
+    def from_arrays(arrays):
+        """
+        Creates the ``CroppedMask`` from the Dict of arrays returned by ``to_arrays``
+
+        :param arrays: Dict of arrays
+        :return: instance of ``CroppedMask``
+        """
+        return CroppedMask(arrays['offset'], arrays['bitmap'], arrays['shape'])
+
+    def to_arrays(self):
+        """
+        Returns the Dict of arrays representing this mask, ex: to store it in an ``ArrayCache``
+
+        :return: Dict with the offset, the bitmap and the shape of the full mask
+        """
+        return {'offset': np.array(self.offset), 'bitmap': self.bitmap, 'shape': np.array(self.shape)}
+
+    @property
+    def bitmap(self):
+        """Boolean array with the mask inside the bounding box"""
+        if not self.packed:
+            return self._bitmap
+
+        size = int(np.prod(self.bitmap_shape))
+        return np.unpackbits(self._bitmap)[:size].reshape(self.bitmap_shape).view(bool)
+
+    @property
+    def bbox(self):
+        """Bounding box of the mask as [top, bottom, left, right], with bottom and right exclusive"""
+        (top, left), (height, width) = self.offset, self.bitmap_shape
+        return [top, top + height, left, left + width]
+
+    @property
+    def slices(self):
+        """Tuple of slices selecting the bounding box from a full size array"""
+        top, bottom, left, right = self.bbox
+        return (slice(top, bottom), slice(left, right))
+
+    @property
+    def nbytes(self):
+        """Number of bytes taken by the bitmap"""
+        return self._bitmap.nbytes
+
+    def sum(self):
+        """
+        Gets the number of set pixels
+
+        :return: number of pixels in the mask
+        """
+        return int(np.count_nonzero(self._bitmap)) if not self.packed else int(np.count_nonzero(self.bitmap))
+
+    def toarray(self, out=None):
+        """
+        Expands the mask to its full size
+
+        :param out: optional preallocated boolean array of the full shape to write the mask to
+        :return: Boolean mask of shape (height, width)
+        """
+        if out is None:
+            out = np.zeros(self.shape, dtype=bool)
+        else:
+            out.fill(False)
+
+        out[self.slices] = self.bitmap
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        mask = self.toarray()
+        return mask if dtype is None else mask.astype(dtype)
+
+    def crop(self, array):
+        """
+        Crops the bounding box of the mask from the given full size array, without copying
+
+        :param array: array whose first two dimensions have the full shape of the mask
+        :return: view of the bounding box of the array
+        """
+        return array[self.slices]
+
+    def values(self, array):
+        """
+        Gets the values of the given full size array inside the mask, in the same order as ``array[mask]``
+
+        :param array: array whose first two dimensions have the full shape of the mask
+        :return: array of the values inside the mask
+        """
+        return self.crop(array)[self.bitmap]
+
+    def select(self, bitmap):
+        """
+        Returns the mask of the pixels that are set in both this mask and the given bitmap of the bounding box, ex:
+        ``roi.select(roi.crop(image) > threshold)``
+
+        :param bitmap: boolean array of the shape of the bounding box
+        :return: instance of ``CroppedMask`` with the same bounding box
+        """
+        return CroppedMask(self.offset, self.bitmap & bitmap, self.shape, self.packed)
+
+    def window(self, rows, columns):
+        """
+        Gets the mask inside the given window of the full size mask, same as ``mask[rows, columns]`` but without
+        expanding the mask
+
+        :param rows: ``slice`` of the rows of the window
+        :param columns: ``slice`` of the columns of the window
+        :return: boolean array of the shape of the window
+        """
+        row_start, row_stop, _ = rows.indices(self.shape[0])
+        column_start, column_stop, _ = columns.indices(self.shape[1])
+        window = np.zeros((max(row_stop - row_start, 0), max(column_stop - column_start, 0)), dtype=bool)
+
+        top, bottom, left, right = self.bbox
+        overlap_top, overlap_bottom = max(top, row_start), min(bottom, row_stop)
+        overlap_left, overlap_right = max(left, column_start), min(right, column_stop)
+
+        if overlap_top < overlap_bottom and overlap_left < overlap_right:
+            window[overlap_top - row_start:overlap_bottom - row_start,
+                   overlap_left - column_start:overlap_right - column_start] = \
+                self.bitmap[overlap_top - top:overlap_bottom - top, overlap_left - left:overlap_right - left]
+
+        return window
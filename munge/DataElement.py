@@ -1,9 +1,9 @@
 """Class to represent a data point in the dataset with relevant features and methods"""
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 
 from .utils import contour, image, misc
+from .CroppedMask import CroppedMask
 
 class DataElement(object):
     """
@@ -11,31 +11,159 @@ class DataElement(object):
 
     - **parameters**, **types**, **return** and **return types**::
     :param dicom_path: full path of the DICOM image
-    :param contour_path: full path of the corresponding contour file
+    :param icontour_path: full path of the corresponding i-contour file
+    :param ocontour_path: full path of the corresponding o-contour file, if any
+    :param lazy: if ``True`` the DICOM image is decoded and the contours are rasterized only on first access
+    :param cache: instance of ``ArrayCache`` in which the decoded image and the masks are persisted
+    :param element_id: id of the element, a random GUID by default
+    :param header: DICOM header of the image (see ``image.parse_dicom_header``), read from the file when needed if not
+        given
     :type dicom_path: string
-    :type contour_path: string
+    :type icontour_path: string
+    :type ocontour_path: string
+    :type lazy: bool
+    :type cache: ArrayCache
+    :type element_id: string
+    :type header: dict
     """
 
-    def __init__(self, dicom_path, icontour_path, ocontour_path=None):
-        self.id = misc.get_uuid()
+    def __init__(self, dicom_path, icontour_path, ocontour_path=None, lazy=False, cache=None, element_id=None,
+                 header=None):
+        self.id = element_id or misc.get_uuid()
+        self._header = header
 
         self.dcm_path = dicom_path
         self.icontour_path = icontour_path
         self.ocontour_path = ocontour_path
+        self.has_ocontour = bool(self.ocontour_path and os.path.exists(self.ocontour_path))
 
         self.dcm_num = contour.get_dcm_num_for_contour(self.icontour_path)
 
-        self.dcm_image = image.parse_dicom_file(self.dcm_path)
-        self.image = self.dcm_image['pixel_data']
+        self.lazy = lazy
+        self.cache = cache
+        self.release()
+
+        if not self.lazy:
+            self.load()
+
+    @property
+    def dcm_image(self):
+        """Dict with the decoded DICOM image data (see ``image.parse_dicom_file``)"""
+        if self._dcm_image is None:
+            self._dcm_image = self._get_dcm_image()
+        return self._dcm_image
+
+    @property
+    def header(self):
+        """Dict with the DICOM header data, read without decoding the pixel data (see ``image.parse_dicom_header``)"""
+        if self._header is None:
+            self._header = image.parse_dicom_header(self.dcm_path)
+        return self._header
+
+    @property
+    def image(self):
+        """Pixel data of the DICOM image"""
+        return self.dcm_image['pixel_data']
+
+    @property
+    def icontour(self):
+        """Co-ordinates of the i-contour"""
+        if self._icontour is None:
+            self._icontour = contour.parse_contour_file(self.icontour_path)
+        return self._icontour
+
+    @property
+    def target_roi(self):
+        """``CroppedMask`` of the i-contour region"""
+        if self._target is None:
+            self._target = self._get_mask(self.icontour_path, lambda: self.icontour)
+        return self._target
+
+    @property
+    def target(self):
+        """Boolean mask of the i-contour region"""
+        return self.target_roi.toarray()
+
+    @property
+    def ocontour(self):
+        """Co-ordinates of the o-contour or ``None`` if the element does not have one"""
+        if self._ocontour is None and self.has_ocontour:
+            self._ocontour = contour.parse_contour_file(self.ocontour_path)
+        return self._ocontour
+
+    @property
+    def ocontour_roi(self):
+        """``CroppedMask`` of the o-contour region or ``None`` if the element does not have an o-contour"""
+        if self._ocontour_mask is None and self.has_ocontour:
+            self._ocontour_mask = self._get_mask(self.ocontour_path, lambda: self.ocontour)
+        return self._ocontour_mask
+
+    @property
+    def ocontour_mask(self):
+        """Boolean mask of the o-contour region or ``None`` if the element does not have an o-contour"""
+        return self.ocontour_roi.toarray() if self.has_ocontour else None
+
+    def _get_dcm_image(self):
+        if self.cache is None:
+            return image.parse_dicom_file(self.dcm_path)
+
+        def compute():
+            dcm_image = image.parse_dicom_file(self.dcm_path)
+            if dcm_image is None:
+                return None
+            return {'pixel_data': dcm_image['pixel_data'], 'resolution': np.array(dcm_image['resolution'])}
+
+        cached = self.cache.fetch(self.dcm_path, 'dicom', compute)
+        if cached is None:
+            return None
+
+        pixel_data = cached['pixel_data']
+        return {
+            'pixel_data': pixel_data,
+            'width': pixel_data.shape[0],
+            'height': pixel_data.shape[1],
+            'resolution': cached['resolution'].tolist()
+        }
+
+    def _get_image_info(self):
+        # a decoded image has the size and spacing already, otherwise only the header is read, so cached masks are
+        # read without decoding the image and the file is not opened twice
+        return self._dcm_image if self._dcm_image is not None else self.header
+
+    def _get_mask(self, contour_path, get_polygon):
+        info = self._get_image_info()
+        width, height = info['width'], info['height']
+        compute = lambda: CroppedMask.from_polygon(get_polygon(), width, height)
+
+        if self.cache is None:
+            return compute()
+
+        arrays = self.cache.fetch(contour_path, 'roi-{}x{}'.format(width, height), lambda: compute().to_arrays())
+        return CroppedMask.from_arrays(arrays)
+
+    def load(self):
+        """
+        Decodes the DICOM image and rasterizes the contours right away instead of waiting for the first access
 
-        self.icontour = contour.parse_contour_file(self.icontour_path)
-        self.target = contour.poly_to_mask(self.icontour, self.dcm_image['width'], self.dcm_image['height'])
+        :return: this ``DataElement``
+        """
+        self.dcm_image
+        self.target_roi
+        self.ocontour_roi
+        return self
 
-        self.ocontour = None
-        self.ocontour_mask = None
-        if self.ocontour_path and os.path.exists(self.ocontour_path):
-            self.ocontour = contour.parse_contour_file(self.ocontour_path)
-            self.ocontour_mask = contour.poly_to_mask(self.ocontour, self.dcm_image['width'], self.dcm_image['height'])
+    def release(self):
+        """
+        Drops the decoded image, contours and masks held in memory. They are recomputed when accessed again
+
+        :return: this ``DataElement``
+        """
+        self._dcm_image = None
+        self._icontour = None
+        self._target = None
+        self._ocontour = None
+        self._ocontour_mask = None
+        return self
 
     def asarray(self):
         """
@@ -45,91 +173,98 @@ class DataElement(object):
         """
         return [image.grayscale_to_rgb(self.image), self.target]
 
-    def get_image_icontour_overlay(self, window=30, patch_color=[255, 0, 0]):
+    def get_image_icontour_overlay(self, window=30, patch_color=[255, 0, 0], levels='auto', out=None):
         """
         Gets a bounding box around the inner contour with and without the i-contour overlaid (horizontally stacked).
         This will be useful for manual verification of the annotation
 
         :param window: size of bounding box required around the marked contour
         :param patch_color: [r, g, b] value of the color in which the patch should be overlaid
+        :param levels: intensity window of the image, see ``image.to_uint8``. ``'auto'`` uses the range of the whole
+            image
+        :param out: optional uint8 array of shape (H, 2 * W, 3) to render the overlay to
         :return: horizontally stacked array with left image being original and the right with the patch drawn
         """
-        return self._get_overlay_for_contour(self.icontour, self.target, window, patch_color)
+        return self._get_overlay_for_contour(self.icontour, [(self.target_roi, patch_color)], window, levels, out)
 
-    def get_image_ocontour_overlay(self, window=30, patch_color=[255, 0, 0]):
+    def get_image_ocontour_overlay(self, window=30, patch_color=[255, 0, 0], levels='auto', out=None):
         """
         Gets a bounding box around the outer contour with and without the o-contour overlaid (horizontally stacked).
         This will be useful for manual verification of the annotation
 
         :param window: size of bounding box required around the marked contour
         :param patch_color: [r, g, b] value of the color in which the patch should be overlaid
+        :param levels: intensity window of the image, see ``image.to_uint8``. ``'auto'`` uses the range of the whole
+            image
+        :param out: optional uint8 array of shape (H, 2 * W, 3) to render the overlay to
         :return: horizontally stacked array with left image being original and the right with the patch drawn
         """
-        if not self.ocontour:
+        if not self.has_ocontour:
             return []
-        return self._get_overlay_for_contour(self.ocontour, self.ocontour_mask, window, patch_color)
-
-    def _get_overlay_for_contour(self, contour, mask, window, patch_color):
-        data_rgb = image.grayscale_to_rgb(self.image)
+        return self._get_overlay_for_contour(self.ocontour, [(self.ocontour_roi, patch_color)], window, levels, out)
 
+    def _get_overlay_for_contour(self, contour, rois_and_colors, window, levels='auto', out=None):
         min_x, max_x, min_y, max_y = misc.get_bounding_box_coords(contour, window)
+        rows, columns = slice(min_x, max_x), slice(min_y, max_y)
 
-        data_copy = np.array(data_rgb, copy=True)
-        data_copy[mask] = patch_color
+        # only the bounding box is converted and painted, the rest of the image is never touched
+        cutout = self.image[rows, columns]
+        height, width = cutout.shape
+        if out is None:
+            out = np.empty((height, 2 * width, 3), dtype=np.uint8)
 
-        data_cutout = data_copy[min_x:max_x, min_y:max_y]
-        data_original = data_rgb[min_x:max_x, min_y:max_y]
+        original, painted = out[:, :width], out[:, width:]
+        image.grayscale_to_rgb(cutout, image.get_levels(self.image, levels), out=original)
+        painted[...] = original
 
-        final_image = [data_original, data_cutout]
-        return np.hstack(final_image)
+        image.paint_masks(painted, [(roi.window(rows, columns), color) for roi, color in rois_and_colors])
+        return out
 
-    def overlay_contours(self, window=30, patch_colors=[[0, 0, 255], [255, 0, 0]]):
+    def overlay_contours(self, window=30, patch_colors=[[0, 0, 255], [255, 0, 0]], levels='auto', out=None):
         """
         Overlays both inner and outer contours for visualization
 
         :param window: Bounding box window size around the ROI
         :param patch_colors: Array of colors for the outer and inner contours
+        :param levels: intensity window of the image, see ``image.to_uint8``. ``'auto'`` uses the range of the whole
+            image
+        :param out: optional uint8 array of shape (H, 2 * W, 3) to render the overlay to
         """
-        if not self.ocontour:
+        if not self.has_ocontour:
             raise AttributeError('The current DataElement does not have an ocontour')
 
         outer_color, inner_color = patch_colors
-        min_x, max_x, min_y, max_y = misc.get_bounding_box_coords(self.ocontour, window)
-
-        data_rgb = image.grayscale_to_rgb(self.image)
-        data_copy = np.array(data_rgb, copy=True)
-
-        data_copy[self.ocontour_mask] = outer_color
-        data_copy[self.target] = inner_color
-
-        data_cutout = data_copy[min_x:max_x, min_y:max_y]
-        data_original = data_rgb[min_x:max_x, min_y:max_y]
+        rois_and_colors = [(self.ocontour_roi, outer_color), (self.target_roi, inner_color)]
 
-        final_image = [data_original, data_cutout]
-        return np.hstack(final_image)
+        return self._get_overlay_for_contour(self.ocontour, rois_and_colors, window, levels, out)
 
     def get_roi_avg_relative_intensity(self, roi='icontour'):
         """
         Gets the relative intensity (%) of the ROI. Relative intensity is w.r.t the maximum intensity of the image
 
-        :return: average intensity in percentage
+        :return: average intensity in percentage, NaN for the o-contour of an element without one
         """
-        mask = self.target if roi == 'icontour' else self.ocontour_mask
+        mask = self.target_roi if roi == 'icontour' else self.ocontour_roi
+        if mask is None:
+            return np.nan
 
-        avg_absolute_intensity = np.mean(self.image[self.target])
+        avg_absolute_intensity = np.mean(mask.values(self.image))
         avg_relative_intensity = (avg_absolute_intensity/self.image.max()) * 100
         return avg_relative_intensity
 
     def get_area_in_sqmm(self, roi='icontour'):
         """
-        Gets the area of the ROI in sq.mm. The conversion is done using the ``PixelSpacing`` tag of the DICOM image.
+        Gets the area of the ROI in sq.mm, counting the pixels of its mask. The conversion is done using the
+        ``PixelSpacing`` tag of the DICOM image.
 
-        :return: area in sq.mm
+        :return: area in sq.mm, NaN for the o-contour of an element without one
         """
-        contour = self.icontour if roi == 'icontour' else self.ocontour
-        area_in_pixels = len(contour)
+        mask = self.target_roi if roi == 'icontour' else self.ocontour_roi
+        if mask is None:
+            return np.nan
+        area_in_pixels = mask.sum()
 
-        res_x, res_y = self.dcm_image['resolution']
+        res_x, res_y = self._get_image_info()['resolution']
         conversion_factor = (res_x * res_y)
 
         return (area_in_pixels * conversion_factor)
@@ -1,18 +1,60 @@
 """Class to load data in the second stage of the pipeline"""
+import functools
+import time
+
 import numpy as np
-import matplotlib.pyplot as plt
 import sys
 
+from .utils import parallel
+from .Dataset import create_element
+
+def _stack_elements(elements):
+    """
+    Stacks the images and i-contour masks of the given elements
+    """
+    images = np.stack([element.image for element in elements])
+    masks = np.zeros(images.shape, dtype=bool)
+
+    for element, mask in zip(elements, masks):
+        mask[element.target_roi.slices] = element.target_roi.bitmap
+
+    return [images, masks]
+
+def _stack_mappings(mappings, cache=None):
+    """
+    Creates lazy elements for the given index mappings and stacks them. Every batch gets its own elements, which are
+    dropped with the batch, so batches loaded at the same time never share an element
+    """
+    return _stack_elements([create_element(mapping, lazy=True, cache=cache) for mapping in mappings])
+
+def _timed_call(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
 class DataLoader(object):
     """
-    DataLoader class can be instantiated with the following args
+    DataLoader class can be instantiated with the following args. With ``num_workers`` set, ``iter_batches`` loads the
+    next ``prefetch`` batches in the background while the current one is being used. The counters of the last run of
+    ``iter_batches`` are available in ``stats``: number of batches, time spent waiting for them, time the workers spent
+    loading them, batches ready when the last one was requested (queue depth), its average and worker utilisation
 
     - **parameters**, **types**, **return** and **return types**::
-    :param dataset: instance of ``Dataset`` class
+    :param dataset: instance of ``Dataset`` or ``MemmapDataset`` class
+    :param num_workers: number of workers loading batches in the background. ``0`` loads them in the calling thread
+    :param prefetch: number of batches loaded ahead of the one being used
+    :param backend: ``'thread'`` or ``'process'`` pool of the workers. A ``MemmapDataset`` is always read with threads
     :type Dataset: string
+    :type num_workers: int
+    :type prefetch: int
+    :type backend: string
     """
-    def __init__(self, dataset):
+    def __init__(self, dataset, num_workers=0, prefetch=2, backend='thread'):
         self.dataset = dataset
+        self.num_workers = num_workers
+        self.prefetch = prefetch
+        self.backend = backend
+        self.stats = None
 
     def load_train_data(self, epochs=10, batch_size=8, log_file='data_loader.log'):
         """
@@ -52,6 +94,101 @@ class DataLoader(object):
         log_file_handler.close()
         return train_data
 
+    def iter_batches(self, epochs=10, batch_size=8, shuffle=True, drop_last=False):
+        """
+        Returns a generator of batches of stacked images and i-contour masks. Only a permutation of the positions is
+        shuffled for every epoch and each batch is loaded just before it is needed, so memory does not grow with the
+        number of epochs. With a lazy ``Dataset`` every batch creates its own elements from the index, which are dropped
+        once the batch is stacked
+
+        :param epochs: number of epochs needed
+        :param batch_size: number of images to be used per batch
+        :param shuffle: whether to shuffle the data in every epoch
+        :param drop_last: whether to skip the last batch of an epoch if it is smaller than ``batch_size``
+        :return: generator of [images, masks] with arrays of shape (batch_size, H, W)
+        """
+        backend = self.backend
+
+        if hasattr(self.dataset, 'get_batch'):
+            size = len(self.dataset)
+            load_batch = self.dataset.get_batch
+            get_batch_arg = lambda indices: indices
+            # worker processes would get a pickled copy of the whole memory-mapped dataset
+            backend = 'thread'
+        elif self.dataset.lazy:
+            mappings = np.empty(len(self.dataset), dtype=object)
+            mappings[:] = list(self.dataset.index)
+            size = len(mappings)
+
+            load_batch = functools.partial(_stack_mappings, cache=self.dataset.cache)
+            get_batch_arg = lambda indices: mappings[indices]
+        else:
+            dataset = [element for element in self.dataset.get_all()]
+            size = len(dataset)
+
+            # the elements are loaded up-front and never released, so the workers can share them
+            elements = np.empty(size, dtype=object)
+            elements[:] = dataset
+            load_batch = _stack_elements
+            get_batch_arg = lambda indices: elements[indices]
+
+        batch_indices = self._iter_batch_indices(size, epochs, batch_size, shuffle, drop_last)
+        yield from self._iter_prefetched(load_batch, (get_batch_arg(indices) for indices in batch_indices), backend)
+
+    @staticmethod
+    def _iter_batch_indices(size, epochs, batch_size, shuffle, drop_last):
+        for _ in range(epochs):
+            order = np.random.permutation(size) if shuffle else None
+
+            for start in range(0, size, batch_size):
+                stop = min(start + batch_size, size)
+                if drop_last and stop - start < batch_size:
+                    break
+
+                # contiguous positions keep memory-mapped batches as views
+                yield order[start:stop] if shuffle else slice(start, stop)
+
+    def _iter_prefetched(self, load_batch, batch_args, backend):
+        """
+        Calls ``load_batch`` for every item of ``batch_args``, keeping up to ``prefetch`` batches in flight while the
+        current one is being used and updating ``stats`` as the batches are consumed
+        """
+        self.stats = {
+            'batches': 0,
+            'wait_time': 0.0,
+            'busy_time': 0.0,
+            'elapsed_time': 0.0,
+            'queue_depth': 0,
+            'avg_queue_depth': 0.0,
+            'worker_utilisation': 0.0
+        }
+        start_time = time.time()
+
+        def on_result(result, wait_time, queue_depth):
+            self._update_stats(start_time, wait_time, result[1], queue_depth)
+
+        timed_results = parallel.imap_ordered(functools.partial(_timed_call, load_batch), batch_args,
+                                              workers=self.num_workers, backend=backend, window=self.prefetch + 1,
+                                              on_result=on_result)
+        try:
+            for batch, _ in timed_results:
+                yield batch
+        finally:
+            timed_results.close()
+
+    def _update_stats(self, start_time, wait_time, busy_time, queue_depth):
+        stats = self.stats
+
+        stats['batches'] += 1
+        stats['wait_time'] += wait_time
+        stats['busy_time'] += busy_time
+        stats['elapsed_time'] = time.time() - start_time
+        stats['queue_depth'] = queue_depth
+        stats['avg_queue_depth'] += (queue_depth - stats['avg_queue_depth']) / stats['batches']
+
+        capacity = stats['elapsed_time'] * max(self.num_workers, 1)
+        stats['worker_utilisation'] = stats['busy_time'] / capacity if capacity else 0.0
+
     @staticmethod
     def plot_random_epoch(data, epoch_size=10, filename=None):
         """
@@ -61,6 +198,8 @@ class DataLoader(object):
         :param epoch_size: size of epoch
         :param filename: file to which the plot should be saved
         """
+        import matplotlib.pyplot as plt
+
         epoch_data = data[np.random.randint(0, epoch_size)]
 
         imgs = []
@@ -1,11 +1,27 @@
 """Class to represent a dataset as a whole or for each study"""
-import os
+import functools
 
-import matplotlib.pyplot as plt
 import numpy as np
 
-from .utils import contour, image, misc
+from .utils import misc, parallel, statistics
 from .DataElement import DataElement
+from .ArrayCache import ArrayCache
+from .DatasetIndex import DatasetIndex
+from .MemmapDataset import MemmapDataset
+from .Study import Study
+
+def create_element(mapping, lazy=False, cache=None):
+    """
+    Creates the ``DataElement`` for the given index mapping. It is a module level function, so that it can be sent to
+    the workers of a process pool
+
+    :param mapping: mapping of ``DatasetIndex``
+    :param lazy: if ``True`` the element decodes its image and contours only on first access
+    :param cache: optional ``ArrayCache`` of decoded images and masks
+    :return: instance of ``DataElement``
+    """
+    return DataElement(mapping['dicom_path'], mapping['icontour_path'], mapping['ocontour_path'], lazy=lazy,
+                       cache=cache, element_id=mapping['id'], header=mapping['header'])
 
 class Dataset(object):
     """
@@ -13,41 +29,73 @@ class Dataset(object):
 
     - **parameters**, **types**, **return** and **return types**::
     :param config_file: full path of the application config file
+    :param lazy: if ``True`` the ``DataElement`` instances decode their image and contours only on first access
+    :param workers: number of workers used to create the ``DataElement`` instances in parallel. ``None`` loads serially
+    :param backend: ``'thread'`` or ``'process'`` pool used when ``workers`` is set
+    :param cache_dir: directory of the on-disk cache of decoded images and masks. ``None`` disables the cache
+    :param cache_size: maximum size of the on-disk cache in bytes. ``None`` for no limit
+    :param index_path: file in which the index of the studies and slices is persisted. ``None`` keeps it in memory
     :type config_file: string
+    :type lazy: bool
+    :type workers: int
+    :type backend: string
+    :type cache_dir: string
+    :type cache_size: int
+    :type index_path: string
     """
-    def __init__(self, config_file='config.json'):
+    def __init__(self, config_file='config.json', lazy=False, workers=None, backend='thread', cache_dir=None,
+                 cache_size=None, index_path=None):
         self.config = misc.get_app_config(config_file)
+        self.lazy = lazy
+        self.workers = workers
+        self.backend = backend
+        self.cache = ArrayCache(cache_dir, cache_size) if cache_dir else None
+        self.index_path = index_path
+        self._index = None
         self.current_dataset = None
 
-    def get_all(self):
-        """
-        Maps the images with the contours and returns a generator with data points
-
-        :return: generator of instances of ``DataElement`` having the corresponding image and contour
-        """
-        dataset = []
+    @property
+    def index(self):
+        """``DatasetIndex`` of the studies and slices, built on first access"""
+        if self._index is None:
+            self._index = DatasetIndex(self.config, self.index_path)
+        return self._index
 
-        for mapping in list(self._get_all_mapping(self.config['link_file_path'])):
-            dicom_path = mapping['dicom_path']
-            icontour_path = mapping['icontour_path']
-            ocontour_path = mapping['ocontour_path']
+    def __len__(self):
+        return len(self.index)
 
-            dataset.append(DataElement(dicom_path, icontour_path, ocontour_path))
+    def __getitem__(self, key):
+        """
+        Creates the ``DataElement`` of a single slice without walking the dataset. Elements have the same id in every
+        run, as it is derived from the path of their i-contour
 
-        self.current_dataset = dataset
-        yield from dataset
+        :param key: integer position, element id or (patient_id, dcm_num) tuple
+        :return: instance of ``DataElement``
+        """
+        return create_element(self.index[key], lazy=self.lazy, cache=self.cache)
 
-    def _get_all_mapping(self, link_file):
+    def get_all(self, cache=False):
         """
-        Combines the result of ``_get_mapping_by_study`` and returns a generator of the mappings
+        Maps the images with the contours and returns a generator with data points. The elements are yielded as soon
+        as they are created, so the first one is available without loading the whole dataset
+
+        :param cache: if ``True`` the elements are also kept in ``current_dataset`` once the generator is exhausted and
+            later calls with ``cache=True`` yield them from there
+        :return: generator of instances of ``DataElement`` having the corresponding image and contour
         """
-        link = misc.csv2dict(link_file)
-        all_mapping = []
+        if cache and self.current_dataset is not None:
+            yield from self.current_dataset
+            return
 
-        for patient_id, original_id in link.items():
-            mapping_for_study = self._get_mapping_by_study(patient_id, original_id)
-            yield from mapping_for_study
+        dataset = []
 
+        for element in self.create_elements(iter(self.index)):
+            if cache:
+                dataset.append(element)
+            yield element
+
+        if cache:
+            self.current_dataset = dataset
 
     def get_by_study(self, patient_id):
         """
@@ -56,39 +104,72 @@ class Dataset(object):
         :param patient_id: unique ID of the study
         :return: generator of instances of ``DataElement`` having the corresponding image and contour, for the given study
         """
-        link = misc.csv2dict(self.config['link_file_path'])
-        original_id = link[patient_id]
-
-        dataset = []
-
-        for mapping in self._get_mapping_by_study(patient_id, original_id):
-            dicom_path = mapping['dicom_path']
-            icontour_path = mapping['icontour_path']
-            ocontour_path = mapping['ocontour_path']
+        yield from self.create_elements(self.index.get_study(patient_id))
 
-            yield DataElement(dicom_path, icontour_path)
+    def get_study(self, patient_id):
+        """
+        Gets the slices of the given study as volumes sorted by dcm_num. The slices are decoded only when requested
 
+        :param patient_id: unique ID of the study
+        :return: instance of ``Study``
+        """
+        return Study(self, patient_id)
 
-    def _get_mapping_by_study(self, patient_id, original_id):
+    def get_roi_statistics(self, rois=('icontour', 'ocontour'), patient_ids=None,
+                           percentiles=statistics.DEFAULT_PERCENTILES):
         """
-        For a given study, finds the mapping between the images and the contours
+        Computes the statistics of the ROIs of all the slices (see ``statistics.get_roi_statistics``), one vectorized
+        pass over the volumes of every study
+
+        :param rois: ROIs to compute the statistics of, ``'icontour'`` and/or ``'ocontour'``
+        :param patient_ids: IDs of the studies, all the studies by default
+        :param percentiles: percentiles of the intensities of the ROIs to compute
+        :return: columnar table, Dict of arrays with a row per slice sorted by study and dcm_num. The ``patient_id``,
+            ``id`` and ``dcm_num`` columns identify the slices and the statistics are in ``<roi>_<statistic>`` columns.
+            The o-contour statistics are NaN for slices without an o-contour
         """
-        icontour_dir = self.config['icontour_dir_template'].format(original_id)
-        ocontour_dir = self.config['ocontour_dir_template'].format(original_id)
+        if patient_ids is None:
+            patient_ids = self.index.patient_ids
+
+        tables = []
+        for patient_id in patient_ids:
+            study = self.get_study(patient_id)
+            table = {
+                'patient_id': np.array([patient_id] * len(study), dtype=object),
+                'id': np.array([mapping['id'] for mapping in study.mappings], dtype=object),
+                'dcm_num': study.dcm_nums
+            }
 
-        mapping = []
-        for icontour_file in os.listdir(icontour_dir):
-            dcm_num = contour.get_dcm_num_for_contour(icontour_file)
+            for roi in rois:
+                roi_statistics = statistics.get_roi_statistics(study.images, study.get_masks(roi), study.spacing,
+                                                               percentiles)
+                for name, values in roi_statistics.items():
+                    values = values.astype(float)
+                    if roi == 'ocontour':
+                        values[~study.has_ocontour] = np.nan
+                    table['{}_{}'.format(roi, name)] = values
 
-            icontour_full_path = icontour_dir + icontour_file
-            ocontour_full_path = misc.get_ocontour_for_icontour(icontour_file, ocontour_dir)
+            tables.append(table)
 
-            yield {
-                'dicom_path': self.config['dicom_path_template'].format(patient_id, dcm_num),
-                'icontour_path': icontour_full_path,
-                'ocontour_path': ocontour_full_path
-            }
+        return statistics.concatenate_tables(tables)
+
+    def create_elements(self, mappings, lazy=None):
+        """
+        Creates the ``DataElement`` instances for the given index mappings, in parallel if ``workers`` is set
+
+        :param mappings: iterable of mappings of ``DatasetIndex``
+        :param lazy: if ``True`` the elements decode their image and contours only on first access, the setting of the
+            dataset by default
+        :return: generator of instances of ``DataElement`` in the order of the mappings
+        """
+        lazy = self.lazy if lazy is None else lazy
+        create = functools.partial(create_element, lazy=lazy, cache=self.cache)
 
+        # lazy elements only hold paths, creating them in a pool would cost more than it saves
+        if lazy:
+            return map(create, mappings)
+
+        return parallel.imap_ordered(create, mappings, workers=self.workers, backend=self.backend)
 
     def plot_verification_for_study(self, patiend_id, filename=None, rows=5, columns=5):
         """
@@ -99,12 +180,15 @@ class Dataset(object):
         :param rows: number of rows in the plot
         :param columns: number of columns in the plot
         """
+        # imported here so that loading the data does not import matplotlib
+        import matplotlib.pyplot as plt
+
         fig = plt.figure(figsize=(15, 15))
 
-        study_elements = [overlay for overlay in self.get_by_study(patiend_id)]
-        study_elements.sort(key=lambda element: element.dcm_num)
+        # the overlays are drawn while the study is assembled, so every slice is decoded once for both plots
+        study = self.get_study(patiend_id)
 
-        for i, data_element in enumerate(study_elements):
+        for i, data_element in enumerate(study.iter_elements()):
             overlay = data_element.get_image_icontour_overlay()
 
             ax = fig.add_subplot(rows, columns, i + 1)
@@ -113,18 +197,18 @@ class Dataset(object):
             ax.set_yticks([])
             plt.imshow(overlay, interpolation='none')
 
-        ax = fig.add_subplot(rows, columns, len(study_elements) + 2)
+        ax = fig.add_subplot(rows, columns, len(study) + 2)
         ax.set_title('Relative Avg. Intensity (RAI)')
         ax.set_xlabel('Image')
         ax.set_ylabel('RAI')
-        intensities = [element.get_roi_avg_relative_intensity() for element in study_elements]
+        intensities = study.get_relative_intensities()
         plt.plot(np.arange(len(intensities)), intensities)
 
-        ax = fig.add_subplot(rows, columns, len(study_elements) + 3)
+        ax = fig.add_subplot(rows, columns, len(study) + 3)
         ax.set_title('Area of ROI in sq.mm')
         ax.set_xlabel('Image')
         ax.set_ylabel('Area')
-        areas = [element.get_area_in_sqmm() for element in study_elements]
+        areas = study.get_areas()
         plt.plot(np.arange(len(areas)), areas)
 
         fig.suptitle('Study {}'.format(patiend_id))
@@ -140,7 +224,7 @@ class Dataset(object):
 
         :return: array of data and labels of this dataset
         """
-        elements = self.get_all() if not self.current_dataset else self.current_dataset
+        elements = self.get_all() if self.current_dataset is None else self.current_dataset
 
         elements_array = [e.asarray() for e in elements]
         data = [e[0] for e in elements_array]
@@ -148,15 +232,27 @@ class Dataset(object):
 
         return [np.asarray(data), np.asarray(label)]
 
+    def export(self, export_dir):
+        """
+        Exports the images, i-contour masks and o-contour masks of the whole dataset to contiguous memory-mappable
+        arrays. The elements are decoded one at a time, so the dataset never has to fit in memory
+
+        :param export_dir: directory to export the dataset to
+        :return: instance of ``MemmapDataset`` for the exported dataset
+        """
+        elements = list(self.create_elements(iter(self.index), lazy=True))
+
+        return MemmapDataset.export(elements, export_dir)
+
     def to_dict(self, patient_id=None):
         """
         Returns the Dict representation of the dataset
 
         :return: Dict having id, dcm_path and contour_path attributes of the data points in this dataset
         """
-        if patient_id:
-            elements = self.get_by_study(patient_id)
-        else:
-            elements = self.get_all()
+        mappings = self.index.get_study(patient_id) if patient_id else iter(self.index)
+
+        # only the paths are needed here, so the elements never decode their image and contours
+        elements = self.create_elements(mappings, lazy=True)
 
         return [{'id': e.id, 'dcm_path': e.dcm_path, 'icontour_path': e.icontour_path} for e in elements]
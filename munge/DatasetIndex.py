@@ -0,0 +1,195 @@
+"""Class to index the studies and slices of a dataset once instead of scanning the directories on every call"""
+import json
+import os
+import tempfile
+
+from .utils import contour, image, misc
+
+# part of the signature, so that indexes persisted in an older format are rebuilt
+INDEX_VERSION = 2
+
+class DatasetIndex(object):
+    """
+    DatasetIndex class can be instantiated with the following args. The index maps every study (patient_id) to its
+    original_id and its slices, with the paths of the DICOM image, the i-contour and the o-contour (``None`` if it does
+    not exist), the dcm_num, a stable id and the DICOM header (see ``image.parse_dicom_header``) of every slice. The
+    headers are read without decoding the pixel data. With ``index_path`` the index is persisted and loaded back as long
+    as the link file, the contour directories and the DICOM directories have not been modified since it was built.
+
+    - **parameters**, **types**, **return** and **return types**::
+    :param config: application configuration, see ``misc.get_app_config``
+    :param index_path: path of the file to persist the index to. ``None`` keeps it in memory only
+    :type config: dict
+    :type index_path: string
+    """
+    def __init__(self, config, index_path=None):
+        self.config = config
+        self.index_path = index_path
+        self.studies = None
+        self.slices = None
+        self.loaded = False
+
+        if index_path and os.path.exists(index_path):
+            self.load()
+
+        if self.studies is None:
+            self.build()
+            if index_path:
+                self.save()
+
+    def __len__(self):
+        return len(self.slices)
+
+    def __iter__(self):
+        return iter(self.slices)
+
+    def __getitem__(self, key):
+        """
+        Gets the mapping of a single slice by its position in the index, its id or its (patient_id, dcm_num)
+
+        :param key: integer position, id string or (patient_id, dcm_num) tuple
+        :return: Dict with the id, patient_id, dcm_num, dicom_path, icontour_path, ocontour_path and header of the slice
+        """
+        if isinstance(key, tuple):
+            return self.get_slice(*key)
+        if isinstance(key, str):
+            return self._by_id[key]
+        return self.slices[key]
+
+    @property
+    def patient_ids(self):
+        """IDs of the studies in the order of the link file"""
+        return list(self.studies)
+
+    def get_original_id(self, patient_id):
+        """
+        Gets the original_id of the contours of the given study
+
+        :param patient_id: unique ID of the study
+        :return: original_id of the study
+        """
+        return self.studies[patient_id]['original_id']
+
+    def get_study(self, patient_id):
+        """
+        Gets the mappings of the slices of the given study
+
+        :param patient_id: unique ID of the study
+        :return: list of Dicts with the id, patient_id, dcm_num, dicom_path, icontour_path, ocontour_path and header of
+            every slice
+        """
+        return self.studies[patient_id]['slices']
+
+    def get_slice(self, patient_id, dcm_num):
+        """
+        Gets the mapping of a single slice
+
+        :param patient_id: unique ID of the study
+        :param dcm_num: DICOM series number of the slice
+        :return: Dict with the id, patient_id, dcm_num, dicom_path, icontour_path, ocontour_path and header of the slice
+        """
+        return self.studies[patient_id]['by_dcm_num'][dcm_num]
+
+    def build(self):
+        """
+        Scans the link file and the contour directories to build the index. Every directory is listed only once and
+        only the headers of the DICOM files are read
+        """
+        link = misc.csv2dict(self.config['link_file_path'])
+        self._set_studies({patient_id: self._build_study(patient_id, original_id)
+                           for patient_id, original_id in link.items()})
+        self.signature = self._get_signature()
+        self.loaded = False
+
+    def _set_studies(self, studies):
+        self.studies = studies
+        self.slices = [mapping for study in studies.values() for mapping in study['slices']]
+        self._by_id = {mapping['id']: mapping for mapping in self.slices}
+
+    def _build_study(self, patient_id, original_id):
+        icontour_dir = self.config['icontour_dir_template'].format(original_id)
+        ocontour_dir = self.config['ocontour_dir_template'].format(original_id)
+
+        ocontour_files = set(os.listdir(ocontour_dir)) if os.path.isdir(ocontour_dir) else set()
+
+        slices = []
+        for icontour_file in sorted(os.listdir(icontour_dir)):
+            dcm_num = contour.get_dcm_num_for_contour(icontour_file)
+            ocontour_file = icontour_file.replace('icontour', 'ocontour')
+            dicom_path = self.config['dicom_path_template'].format(patient_id, dcm_num)
+
+            slices.append({
+                'id': misc.get_uuid(icontour_dir + icontour_file),
+                'patient_id': patient_id,
+                'dcm_num': dcm_num,
+                'dicom_path': dicom_path,
+                'icontour_path': icontour_dir + icontour_file,
+                'ocontour_path': ocontour_dir + ocontour_file if ocontour_file in ocontour_files else None,
+                'header': image.parse_dicom_header(dicom_path) if os.path.exists(dicom_path) else None
+            })
+
+        return self._make_study(original_id, slices)
+
+    @staticmethod
+    def _make_study(original_id, slices):
+        return {
+            'original_id': original_id,
+            'slices': slices,
+            'by_dcm_num': {mapping['dcm_num']: mapping for mapping in slices}
+        }
+
+    def _get_signature(self):
+        """
+        Gets the modification times of the link file and of the contour and DICOM directories. Adding or removing a
+        file changes the modification time of its directory, so a different signature means that the index is stale
+        """
+        paths = [self.config['link_file_path']]
+        for patient_id, original_id in misc.csv2dict(self.config['link_file_path']).items():
+            paths.append(self.config['icontour_dir_template'].format(original_id))
+            paths.append(self.config['ocontour_dir_template'].format(original_id))
+            paths.append(os.path.dirname(self.config['dicom_path_template'].format(patient_id, 0)))
+
+        return {
+            'version': INDEX_VERSION,
+            'config': self.config,
+            'mtimes': {path: os.stat(path).st_mtime_ns if os.path.exists(path) else None for path in paths}
+        }
+
+    def is_stale(self):
+        """
+        Checks whether the link file or the contour directories changed since the index was built
+
+        :return: ``True`` if the index has to be rebuilt
+        """
+        return self.signature != self._get_signature()
+
+    def save(self):
+        """
+        Writes the index to ``index_path``. The file is replaced in one step, so readers see either the old or the
+        new index
+        """
+        studies = {patient_id: {'original_id': study['original_id'], 'slices': study['slices']}
+                   for patient_id, study in self.studies.items()}
+
+        index_dir = os.path.dirname(os.path.abspath(self.index_path))
+        with tempfile.NamedTemporaryFile('w', dir=index_dir, suffix='.tmp', delete=False) as tmp_file:
+            json.dump({'signature': self.signature, 'studies': studies}, tmp_file)
+        os.replace(tmp_file.name, self.index_path)
+
+    def load(self):
+        """
+        Loads the index from ``index_path``, unless it is stale
+        """
+        try:
+            with open(self.index_path) as index_file:
+                index = json.load(index_file)
+        except ValueError:
+            return
+
+        self.signature = index['signature']
+        if self.is_stale():
+            return
+
+        self._set_studies({patient_id: self._make_study(study['original_id'], study['slices'])
+                           for patient_id, study in index['studies'].items()})
+        self.loaded = True
@@ -1,14 +1,75 @@
 """Class to threshold an image and plot necessary figures related to thresholding"""
 
-from munge.utils import image as image_utils, misc
+import functools
+
+from munge.utils import image as image_utils, metrics, misc, mixture, parallel, postprocessing
 
-from sklearn.mixture import GaussianMixture
 import numpy as np
-from scipy.stats import norm
-import SimpleITK as sitk
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-from skimage import morphology, filters
+
+METHODS = ['gmm', 'em']
+CRITERIA = ['bic', 'aic']
+AUTO_COMPONENTS = [2, 3]
+
+def _fit_histogram(histogram, n_components, method='gmm', init=None, criterion='bic'):
+    """
+    Fits the mixture model to the histogram of intensities of a slice, so only the histogram and not the image is sent
+    to the workers. With ``n_components='auto'`` every count of ``AUTO_COMPONENTS`` is fitted and the one with the
+    lowest ``criterion`` is returned
+
+    :return: means, variances and weights of the components, sorted by their means
+    """
+    if n_components == 'auto':
+        fits = [_fit_histogram(histogram, count, method, init) for count in AUTO_COMPONENTS]
+        return _select_fit(histogram, fits, criterion)
+
+    values, counts = histogram
+
+    if method == 'em':
+        init = init if init is not None and len(init[0]) == n_components else None
+        return mixture.fit_weighted_gmm(values, counts, n_components, init=init)
+
+    # sklearn is slow to import, so it is only imported by the processes fitting with it
+    from sklearn.mixture import GaussianMixture
+
+    # GaussianMixture takes no sample weights, so the histogram is expanded back to the intensities of the pixels
+    gmm = GaussianMixture(n_components=n_components, covariance_type='full')
+    gmm.fit(np.repeat(values, counts).reshape(-1, 1))
+
+    order = np.argsort(gmm.means_.ravel())
+    return gmm.means_.ravel()[order], gmm.covariances_.ravel()[order], gmm.weights_[order]
+
+def _get_information_criterion(histogram, fit, criterion='bic'):
+    """
+    Gets the Bayesian or Akaike information criterion of the fit. Lower is better
+    """
+    values, counts = histogram
+
+    # every component has a mean, a variance and a weight, and the weights sum up to 1
+    n_parameters = 3 * len(fit[0]) - 1
+    penalty = n_parameters * np.log(np.sum(counts)) if criterion == 'bic' else 2 * n_parameters
+
+    return -2 * mixture.log_likelihood(values, counts, *fit) + penalty
+
+def _select_fit(histogram, fits, criterion='bic'):
+    scores = [_get_information_criterion(histogram, fit, criterion) for fit in fits]
+    return fits[int(np.argmin(scores))]
+
+def _check_method(method):
+    if method not in METHODS:
+        raise ValueError('Unknown method {}. Supported methods are {}'.format(method, METHODS))
+
+def _check_criterion(criterion):
+    if criterion not in CRITERIA:
+        raise ValueError('Unknown criterion {}. Supported criteria are {}'.format(criterion, CRITERIA))
+
+def _get_threshold(means):
+    """
+    Gets the threshold from the sorted means of the components
+    """
+    # if bi-modal then take the average otherwise take average of low and medium intensity to get the threshold
+    if len(means) == 2:
+        return np.mean(means)
+    return np.mean(means[:2])
 
 class ImageThresholder(object):
     """
@@ -16,89 +77,210 @@ class ImageThresholder(object):
 
     - **parameters**, **types**, **return** and **return types**::
     :param data_element: Instance of ``DataElement`` class
-    :param n_components: Number of components to the model fit
-    :type method: Method to use for model fit. Currently only GMM is supported
-    :type postprocess: Boolean to specify whether to do morphological postprocessing after thresholding
+    :param n_components: Number of components to the model fit, or ``'auto'`` to choose between bi- and tri-modal by
+        ``criterion``
+    :type method: Method to use for model fit. ``'gmm'`` fits sklearn's ``GaussianMixture`` to the pixels, ``'em'`` fits
+        the same model with expectation maximization on the histogram bins, which is much cheaper
+    :type postprocess: Boolean to specify whether to do morphological postprocessing after thresholding, or the list of
+        operations of the pipeline (see ``postprocessing.get_pipeline``). ``True`` dilates with a disk of radius 3
+    :type init: optional (means, variances, weights) of a previous fit, ex: of a neighbouring slice, to warm-start the
+        ``'em'`` method from
+    :type criterion: ``'bic'`` or ``'aic'``, information criterion used to choose the number of components with
+        ``n_components='auto'``
+    :type workers: number of threads fitting the candidate numbers of components in parallel with
+        ``n_components='auto'``. ``None`` fits them serially
     """
-    def __init__(self, data_element, n_components=2, method='gmm', postprocess=False):
+    def __init__(self, data_element, n_components=2, method='gmm', postprocess=False, init=None, criterion='bic',
+                 workers=None):
         self.data_element = data_element
         self.image = self.data_element.image
         self.method = method
         self.postprocess = postprocess
 
-        if not self.data_element.ocontour_path:
+        if not self.data_element.has_ocontour:
             raise ValueError('DataElement does not have an outer contour')
 
-        self.mask = self.data_element.ocontour_mask
-        self.masked_image = self.image[self.mask]
+        self.roi = self.data_element.ocontour_roi
+        self.masked_image = self.roi.values(self.image)
 
         self.n_components = n_components
+        self.init = init
+        self.criterion = criterion
+        self.workers = workers
         self.model = None
+        self.selected_components = None
 
-        if method != 'gmm':
-            raise ValueError('Currently only GMM thresholding is supported')
+        self._histogram = None
+        self.invalidate()
 
-    def get_thresholded_contour_mask(self):
+        _check_method(method)
+        _check_criterion(criterion)
+
+    def invalidate(self):
+        """
+        Drops the memoized fits and thresholding results, ex: after changing ``init``. Changing ``n_components``,
+        ``method``, ``criterion`` or ``postprocess`` does not need it, the results are memoized per setting
         """
-        Thresholds the o-contour region and returns a mask
+        # fits by method and number of components, so that the model of the slice is only fitted once
+        self._fits = {}
+        # thresholding results by method, number of components and criterion
+        self._results = {}
+
+    @property
+    def histogram(self):
+        """Distinct intensities of the o-contour region and their counts"""
+        if self._histogram is None:
+            self._histogram = np.unique(self.masked_image, return_counts=True)
+        return self._histogram
+
+    def get_model_fit(self, n_components=None):
+        """
+        Fits the model to the o-contour region, or returns the fit made earlier for the same number of components. With
+        ``'auto'`` the candidate numbers of components are fitted in parallel and the fit with the lowest information
+        criterion is returned
 
-        :return: Boolean mask containing the thresholded image
+        :param n_components: number of components, defaults to ``n_components`` of the thresholder
+        :return: means, variances and weights of the components, sorted by their means
         """
+        n_components = self.n_components if n_components is None else n_components
 
-        uniq = np.unique(self.masked_image, return_counts=True)
-        data_points = [point for point in zip(*uniq)]
+        if n_components == 'auto':
+            missing = [count for count in AUTO_COMPONENTS if (self.method, count) not in self._fits]
+            fit = functools.partial(_fit_histogram, self.histogram, method=self.method, init=self.init)
+            for count, count_fit in zip(missing, parallel.imap_ordered(fit, missing, workers=self.workers)):
+                self._fits[self.method, count] = count_fit
 
-        # define a gaussian mixture model and fit it to the masked image
-        gmm = GaussianMixture(n_components=self.n_components, covariance_type='full').fit(self.masked_image.reshape(-1, 1))
-        self.model = gmm
+            fits = [self._fits[self.method, count] for count in AUTO_COMPONENTS]
+            return _select_fit(self.histogram, fits, self.criterion)
 
-        # take the cluster_intensities which are the means of the gaussians
-        cluster_intensities = [p[0] for p in gmm.means_]
+        if (self.method, n_components) not in self._fits:
+            self._fits[self.method, n_components] = _fit_histogram(self.histogram, n_components, self.method, self.init)
+        return self._fits[self.method, n_components]
 
-        # if bi-modal then take the average otherwise take average of low and medium intensity to get the threshold
-        if self.n_components == 2:
-            threshold = np.mean(cluster_intensities)
-        else:
-            cluster_intensities.sort()
-            threshold = np.mean(cluster_intensities[:2])
+    def get_thresholded_contour_mask(self):
+        """
+        Thresholds the o-contour region and returns a mask. The fit, the mask and the postprocessed mask are memoized,
+        so calling it again with the same settings returns the same array without any computation
+
+        :return: Boolean mask containing the thresholded image
+        """
+        result = self._get_result()
 
-        # generate the gaussian curves for plotting purpose using scipy.stats.norm.pdf
-        x = np.arange(0, self.masked_image.max())
-        std_devs = np.sqrt(gmm.covariances_.flatten())
-        gaussians = np.array([p * norm.pdf(x, mu, std_dev)
-                                    for mu, std_dev, p in zip(gmm.means_.flatten(), std_devs, gmm.weights_)])
+        self.model = result['model']
+        self.selected_components = len(self.model['means'])
+        self.fits = result['fits']
+        self.threshold = result['threshold']
 
-        self.fits = gaussians
-        self.threshold = threshold
+        pipeline = postprocessing.get_pipeline(self.postprocess)
+        if not pipeline:
+            return result['mask']
 
-        img = self.image.copy()
+        processed_masks = result['processed_masks']
+        if pipeline not in processed_masks:
+            processed_masks[pipeline] = postprocessing.apply_pipeline(result['mask'], pipeline)
 
-        #first make all the pixels other than the o-contour mask as 0. we are not interested anything outside o-contour
-        img[~self.mask] = 0
+        return processed_masks[pipeline]
 
-        thresholded_img = (img > threshold)
+    def _get_result(self):
+        key = (self.method, self.n_components, self.criterion)
 
-        if self.postprocess:
-            postprocess_pipeline = [self.dilate]
+        if key not in self._results:
+            means, variances, weights = self.get_model_fit()
+            threshold = _get_threshold(means)
 
-            processed_img = thresholded_img
+            # generate the weighted gaussian curves for plotting purpose
+            x = np.arange(0, self.masked_image.max())
+            mu, var, p = (np.asarray(param, dtype=float)[:, None] for param in (means, variances, weights))
+            gaussians = p * np.exp(-(x - mu) ** 2 / (2 * var)) / np.sqrt(2 * np.pi * var)
 
-            for fn in postprocess_pipeline:
-                processed_img = fn(processed_img)
+            # we are not interested in anything outside the o-contour, so only its bounding box is thresholded
+            thresholded_img = self.roi.select(self.roi.crop(self.image) > threshold).toarray()
 
-            return processed_img
+            self._results[key] = {
+                'model': {'means': means, 'variances': variances, 'weights': weights},
+                'threshold': threshold,
+                'fits': gaussians,
+                'mask': thresholded_img,
+                'processed_masks': {}
+            }
 
-        return thresholded_img
+        return self._results[key]
 
+    @staticmethod
+    def threshold_elements(elements, n_components=2, method='gmm', postprocess=False, workers=None, backend='process',
+                           warm_start=False, criterion='bic'):
+        """
+        Thresholds the o-contour regions of many slices at once, ex: of a whole study or dataset. The histograms of the
+        o-contour regions are computed up-front and only those are sent to the workers fitting the models. Elements
+        without an o-contour are skipped. With ``warm_start`` every ``'em'`` fit starts from the fit of the previous
+        element, which suits the consecutive slices of a study but makes the fits serial
+
+        :param elements: iterable of ``DataElement`` instances with images of the same shape
+        :param n_components: Number of components to the model fit, or ``'auto'`` to choose it for every element
+        :param method: Method to use for model fit, ``'gmm'`` or ``'em'``
+        :param postprocess: Boolean to specify whether to do morphological postprocessing after thresholding, or the
+            list of operations of the pipeline. The whole stack of masks is processed at once
+        :param workers: number of workers fitting the models in parallel. ``None`` fits them serially
+        :param backend: ``'thread'`` or ``'process'`` pool used when ``workers`` is set
+        :param warm_start: whether to start every ``'em'`` fit from the previous one
+        :param criterion: ``'bic'`` or ``'aic'``, used with ``n_components='auto'``
+        :return: Dict with the ``ids`` of the N thresholded elements, their ``thresholds`` of shape (N,), thresholded
+            ``masks`` of shape (N, H, W), the ``n_components`` of the fits of shape (N,) and their ``means``,
+            ``variances`` and ``weights`` of shape (N, K). K is the largest number of components and the parameters of
+            fits with fewer components are padded with NaN
+        """
+        _check_method(method)
+        _check_criterion(criterion)
+
+        elements = [element for element in elements if element.has_ocontour]
+        if not elements:
+            raise ValueError('None of the DataElements has an outer contour')
 
-    def dilate(self, thresholded_img):
+        rois = [element.ocontour_roi for element in elements]
+        histograms = [np.unique(roi.values(element.image), return_counts=True) for element, roi in zip(elements, rois)]
+
+        if warm_start and method == 'em':
+            fits = []
+            for histogram in histograms:
+                fits.append(_fit_histogram(histogram, n_components, method, fits[-1] if fits else None, criterion))
+        else:
+            fit = functools.partial(_fit_histogram, n_components=n_components, method=method, criterion=criterion)
+            fits = list(parallel.imap_ordered(fit, histograms, workers=workers, backend=backend))
+
+        component_counts = np.array([len(fit[0]) for fit in fits])
+        means, variances, weights = [np.full((len(fits), component_counts.max()), np.nan) for _ in range(3)]
+        for i, fit in enumerate(fits):
+            for params, fit_params in zip([means, variances, weights], fit):
+                params[i, :len(fit_params)] = fit_params
+
+        thresholds = np.array([_get_threshold(fit[0]) for fit in fits])
+
+        masks = np.zeros((len(elements),) + elements[0].image.shape, dtype=bool)
+        for element, roi, threshold, mask in zip(elements, rois, thresholds, masks):
+            roi.select(roi.crop(element.image) > threshold).toarray(out=mask)
+
+        if postprocessing.get_pipeline(postprocess):
+            masks = postprocessing.apply_pipeline(masks, postprocess)
+
+        return {
+            'ids': [element.id for element in elements],
+            'thresholds': thresholds,
+            'masks': masks,
+            'n_components': component_counts,
+            'means': means,
+            'variances': variances,
+            'weights': weights
+        }
+
+    @staticmethod
+    def dilate(thresholded_img):
         """
         Performs binary dilation on the given image using a disk-shaped structural element of arbitrary radius 3.
 
         :param thresholded_img: thresholded image
         :return: dilated image
         """
-        return morphology.binary_dilation(thresholded_img, morphology.disk(radius=3))
+        return postprocessing.apply_pipeline(thresholded_img, [('dilate', {'radius': 3})])
 
     def get_jaccard_coeff(self):
         """
@@ -106,20 +288,7 @@ class ImageThresholder(object):
 
         :return: jaccard coefficient
         """
-        contour_mask = self.get_thresholded_contour_mask()
-
-        image_copy = self.image.copy()
-        image_copy[contour_mask] = 255
-        image_copy[~contour_mask] = 0
-
-        ref_img = self.image.copy()
-        ref_img[self.data_element.target] = 255
-        ref_img[~self.data_element.target] = 0
-
-        label_measures = sitk.LabelOverlapMeasuresImageFilter()
-        label_measures.Execute(sitk.GetImageFromArray(ref_img), sitk.GetImageFromArray(image_copy))
-
-        return label_measures.GetJaccardCoefficient()
+        return metrics.jaccard_coeff(self.data_element.target_roi.toarray(), self.get_thresholded_contour_mask())
 
     def plot_model_fit(self, filename=None):
         """
@@ -128,6 +297,8 @@ class ImageThresholder(object):
 
         :param filename: File path to save the plot
         """
+        import matplotlib.pyplot as plt
+
         if not self.model:
             self.get_thresholded_contour_mask()
 
@@ -155,6 +326,8 @@ class ImageThresholder(object):
 
         :param filename: File path to save the plot
         """
+        import matplotlib.pyplot as plt
+
         min_x, max_x, min_y, max_y = misc.get_bounding_box_coords(self.data_element.ocontour)
 
         rgb_img = image_utils.grayscale_to_rgb(self.image)
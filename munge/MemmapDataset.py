@@ -0,0 +1,103 @@
+"""Class to represent a dataset exported to contiguous memory-mapped arrays"""
+import json
+import os
+
+import numpy as np
+
+IMAGES_FILE = 'images.npy'
+TARGETS_FILE = 'targets.npy'
+OCONTOUR_MASKS_FILE = 'ocontour_masks.npy'
+INDEX_FILE = 'index.json'
+
+class MemmapDataset(object):
+    """
+    MemmapDataset class can be instantiated with the following args. The arrays are opened with ``np.memmap``, so only
+    the slices that are actually read are loaded from disk. Use ``Dataset.export`` to create the export directory.
+
+    - **parameters**, **types**, **return** and **return types**::
+    :param export_dir: directory to which the dataset was exported
+    :type export_dir: string
+    """
+    def __init__(self, export_dir):
+        self.export_dir = export_dir
+
+        self.images = np.load(os.path.join(export_dir, IMAGES_FILE), mmap_mode='r')
+        self.targets = np.load(os.path.join(export_dir, TARGETS_FILE), mmap_mode='r')
+        self.ocontour_masks = np.load(os.path.join(export_dir, OCONTOUR_MASKS_FILE), mmap_mode='r')
+
+        with open(os.path.join(export_dir, INDEX_FILE)) as index_file:
+            self.index = json.load(index_file)
+
+    def __len__(self):
+        return len(self.index)
+
+    def get_batch(self, indices):
+        """
+        Gets the images and i-contour masks at the given positions. A ``slice`` returns views into the memory-mapped
+        arrays without copying, an array of positions (ex: a shuffled batch) returns copies
+
+        :param indices: ``slice`` or array of positions
+        :return: array of images of shape (N, H, W) and array of i-contour masks of shape (N, H, W)
+        """
+        return [self.images[indices], self.targets[indices]]
+
+    @staticmethod
+    def export(elements, export_dir):
+        """
+        Writes the images, i-contour masks and o-contour masks of the given elements to contiguous ``.npy`` arrays along
+        with an index file having the id, paths, dcm_num and resolution of every element. Elements without an o-contour
+        get an empty o-contour mask. Every element is released as soon as it is written
+
+        :param elements: list of ``DataElement`` instances with images of the same shape
+        :param export_dir: directory to export the dataset to
+        :return: instance of ``MemmapDataset`` for the exported dataset
+        """
+        os.makedirs(export_dir, exist_ok=True)
+
+        index = []
+        images = targets = ocontour_masks = None
+
+        for i, element in enumerate(elements):
+            if images is None:
+                shape = (len(elements),) + element.image.shape
+                images = np.lib.format.open_memmap(os.path.join(export_dir, IMAGES_FILE), mode='w+',
+                                                   dtype=element.image.dtype, shape=shape)
+                targets = np.lib.format.open_memmap(os.path.join(export_dir, TARGETS_FILE), mode='w+',
+                                                    dtype=bool, shape=shape)
+                ocontour_masks = np.lib.format.open_memmap(os.path.join(export_dir, OCONTOUR_MASKS_FILE), mode='w+',
+                                                           dtype=bool, shape=shape)
+
+            if element.image.shape != images.shape[1:]:
+                raise ValueError('Image {} has shape {} but the exported images have shape {}'.format(
+                    element.dcm_path, element.image.shape, images.shape[1:]))
+            if not np.can_cast(element.image.dtype, images.dtype):
+                raise ValueError('Image {} has dtype {} but the exported images have dtype {}'.format(
+                    element.dcm_path, element.image.dtype, images.dtype))
+
+            # the new arrays are zero filled, only the bounding boxes of the masks have to be written
+            images[i] = element.image
+            targets[i][element.target_roi.slices] = element.target_roi.bitmap
+            if element.has_ocontour:
+                ocontour_masks[i][element.ocontour_roi.slices] = element.ocontour_roi.bitmap
+
+            index.append({
+                'id': element.id,
+                'dcm_path': element.dcm_path,
+                'icontour_path': element.icontour_path,
+                'ocontour_path': element.ocontour_path if element.has_ocontour else None,
+                'dcm_num': element.dcm_num,
+                'resolution': element.dcm_image['resolution']
+            })
+
+            element.release()
+
+        if images is None:
+            raise ValueError('Cannot export an empty dataset')
+
+        for array in [images, targets, ocontour_masks]:
+            array.flush()
+
+        with open(os.path.join(export_dir, INDEX_FILE), 'w') as index_file:
+            json.dump(index, index_file)
+
+        return MemmapDataset(export_dir)
@@ -0,0 +1,172 @@
+"""Class to evaluate the heuristic segmentation of the i-contour over a whole dataset"""
+import csv
+import functools
+import json
+import os
+import time
+
+import numpy as np
+
+from .utils import metrics, parallel
+from .ImageThresholder import ImageThresholder
+
+METRICS = ['jaccard', 'dice', 'sensitivity', 'specificity', 'hausdorff']
+
+def _evaluate_element(element, n_components=2, method='gmm', postprocess=False):
+    """
+    Thresholds the o-contour of the given element and compares the result with its i-contour
+    """
+    start = time.time()
+
+    thresholder = ImageThresholder(element, n_components=n_components, method=method, postprocess=postprocess)
+    predicted = thresholder.get_thresholded_contour_mask()
+    reference = element.target_roi.toarray()
+
+    record = {
+        'id': element.id,
+        'dcm_path': element.dcm_path,
+        'dcm_num': element.dcm_num,
+        'threshold': float(thresholder.threshold),
+        'n_components': thresholder.selected_components
+    }
+    record.update(metrics.get_overlap_measures(reference, predicted))
+    record['hausdorff'] = metrics.hausdorff_distance(reference, predicted, spacing=element.dcm_image['resolution'])
+    record['time'] = time.time() - start
+
+    if element.lazy:
+        element.release()
+
+    return record
+
+def _summarize(records):
+    summary = {'slices': len(records), 'time': float(sum(record['time'] for record in records))}
+
+    for metric in METRICS:
+        values = np.array([record[metric] for record in records], dtype=float)
+        summary[metric] = {
+            'mean': float(np.nanmean(values)),
+            'std': float(np.nanstd(values)),
+            'median': float(np.nanmedian(values)),
+            'min': float(np.nanmin(values)),
+            'max': float(np.nanmax(values))
+        }
+
+    return summary
+
+def _to_json(value):
+    """
+    Replaces the NaN values of the given report, ex: the Hausdorff distance of an empty prediction, with ``None``, as
+    JSON has no NaN
+    """
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+class SegmentationEvaluator(object):
+    """
+    SegmentationEvaluator class can be instantiated with the following args. Every element having an o-contour is
+    thresholded with ``ImageThresholder`` and compared with its i-contour, in parallel if ``workers`` is set. Use a
+    lazy ``Dataset`` with the ``'process'`` backend, so that the workers get the paths of the elements instead of their
+    images
+
+    - **parameters**, **types**, **return** and **return types**::
+    :param dataset: instance of ``Dataset`` class
+    :param n_components: Number of components to the model fit, or ``'auto'``
+    :param method: Method to use for model fit, ``'gmm'`` or ``'em'``
+    :param postprocess: Boolean to specify whether to do morphological postprocessing after thresholding
+    :param workers: number of workers evaluating the elements in parallel. ``None`` evaluates them serially
+    :param backend: ``'thread'`` or ``'process'`` pool used when ``workers`` is set
+    :type dataset: Dataset
+    :type n_components: int
+    :type method: string
+    :type postprocess: bool
+    :type workers: int
+    :type backend: string
+    """
+    def __init__(self, dataset, n_components=2, method='gmm', postprocess=False, workers=None, backend='process'):
+        self.dataset = dataset
+        self.n_components = n_components
+        self.method = method
+        self.postprocess = postprocess
+        self.workers = workers
+        self.backend = backend
+
+    def evaluate(self, patient_ids=None, report_dir=None):
+        """
+        Evaluates the segmentation of every element having an o-contour and aggregates the metrics per study and over
+        all the studies. Every slice record has the id, dcm_path, dcm_num, threshold and number of components of the
+        fit, the Jaccard and Dice coefficients, sensitivity, specificity, Hausdorff distance in mm and the time taken
+
+        :param patient_ids: IDs of the studies to evaluate, all the studies by default
+        :param report_dir: optional directory to write the slice records to ``slices.csv`` and the whole report to
+            ``report.json``
+        :return: Dict with the ``slices`` records, the ``studies`` and ``global`` summaries, the ``elapsed_time`` and
+            the ``throughput`` in slices per second
+        """
+        if patient_ids is None:
+            patient_ids = self.dataset.index.patient_ids
+
+        start = time.time()
+
+        evaluate = functools.partial(_evaluate_element, n_components=self.n_components, method=self.method,
+                                     postprocess=self.postprocess)
+
+        # the study of every element, in the order the elements are evaluated
+        study_ids = []
+        elements = self._get_elements(patient_ids, study_ids)
+        records = list(parallel.imap_ordered(evaluate, elements, workers=self.workers, backend=self.backend))
+
+        for patient_id, record in zip(study_ids, records):
+            record['patient_id'] = patient_id
+
+        elapsed_time = time.time() - start
+
+        studies = {}
+        for patient_id in patient_ids:
+            study_records = [record for record in records if record['patient_id'] == patient_id]
+            if study_records:
+                studies[patient_id] = _summarize(study_records)
+
+        report = {
+            'slices': records,
+            'studies': studies,
+            'global': _summarize(records) if records else None,
+            'elapsed_time': elapsed_time,
+            'throughput': len(records) / elapsed_time if elapsed_time else 0.0
+        }
+
+        if report_dir:
+            self.write_report(report, report_dir)
+
+        return report
+
+    def _get_elements(self, patient_ids, study_ids):
+        for patient_id in patient_ids:
+            for element in self.dataset.get_by_study(patient_id):
+                if element.has_ocontour:
+                    study_ids.append(patient_id)
+                    yield element
+
+    @staticmethod
+    def write_report(report, report_dir):
+        """
+        Writes the slice records of the report to ``slices.csv`` and the whole report to ``report.json``, where NaN
+        values are written as ``null``
+
+        :param report: return value of ``evaluate``
+        :param report_dir: directory to write the report to
+        """
+        os.makedirs(report_dir, exist_ok=True)
+
+        columns = ['patient_id', 'id', 'dcm_path', 'dcm_num', 'threshold', 'n_components'] + METRICS + ['time']
+        with open(os.path.join(report_dir, 'slices.csv'), 'w', newline='') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(report['slices'])
+
+        with open(os.path.join(report_dir, 'report.json'), 'w') as json_file:
+            json.dump(_to_json(report), json_file, indent=2, allow_nan=False)
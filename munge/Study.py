@@ -0,0 +1,177 @@
+"""Class to represent the slices of a study as volumes"""
+import numpy as np
+
+class Study(object):
+    """
+    Study class can be instantiated with the following args. The images, i-contour masks and o-contour masks of the
+    slices are assembled into volumes of shape (Z, H, W), sorted by dcm_num. The shape and the spacing come from the
+    DICOM headers in the index of the dataset, so nothing is decoded until the slices are requested, and only the
+    requested slices are decoded. Masks are rasterized without decoding the images. Use ``Dataset.get_study`` to create
+    it.
+
+    - **parameters**, **types**, **return** and **return types**::
+    :param dataset: instance of ``Dataset`` class
+    :param patient_id: unique ID of the study
+    :type dataset: Dataset
+    :type patient_id: string
+    """
+    def __init__(self, dataset, patient_id):
+        self.dataset = dataset
+        self.patient_id = patient_id
+
+        self.mappings = sorted(dataset.index.get_study(patient_id), key=lambda mapping: mapping['dcm_num'])
+        self.dcm_nums = np.array([mapping['dcm_num'] for mapping in self.mappings], dtype=int)
+        self.has_ocontour = np.array([mapping['ocontour_path'] is not None for mapping in self.mappings], dtype=bool)
+
+        headers = [mapping['header'] for mapping in self.mappings]
+        sizes = {(header['width'], header['height']) for header in headers}
+        spacings = {tuple(header['resolution']) for header in headers}
+        if len(sizes) > 1 or len(spacings) > 1:
+            raise ValueError('Slices of study {} have sizes {} and spacings {}, they must be the same in a volume'
+                             .format(patient_id, sorted(sizes), sorted(spacings)))
+
+        self.shape = (len(self.mappings),) + (sizes.pop() if sizes else (0, 0))
+        self.spacing = list(spacings.pop()) if spacings else None
+
+        self._images = None
+        self.targets = np.zeros(self.shape, dtype=bool)
+        self.ocontour_masks = np.zeros(self.shape, dtype=bool)
+
+        self.images_loaded = np.zeros(len(self), dtype=bool)
+        self.masks_loaded = np.zeros(len(self), dtype=bool)
+
+    def __len__(self):
+        return len(self.mappings)
+
+    @property
+    def pixel_area(self):
+        """Area of a pixel in sq.mm"""
+        return float(np.prod(self.spacing))
+
+    def get_positions(self, dcm_nums):
+        """
+        Gets the positions in the volumes of the slices with the given dcm_nums
+
+        :param dcm_nums: DICOM series numbers of the slices
+        :return: array of positions
+        """
+        positions = np.searchsorted(self.dcm_nums, dcm_nums)
+        if np.any(positions >= len(self)) or np.any(self.dcm_nums[np.minimum(positions, len(self) - 1)] != dcm_nums):
+            raise KeyError('Study {} has no slices {}'.format(self.patient_id, dcm_nums))
+        return positions
+
+    def load(self, positions=None, images=True):
+        """
+        Decodes the given slices into the volumes, the slices that are already loaded are skipped
+
+        :param positions: ``slice`` or array of positions of the slices, all the slices by default
+        :param images: if ``False`` only the masks are loaded, without decoding the images
+        :return: this ``Study``
+        """
+        positions = self._get_positions(positions)
+        loaded = self._get_loaded(images)
+
+        for _ in self.iter_elements(positions[~loaded[positions]], images):
+            pass
+        return self
+
+    def iter_elements(self, positions=None, images=True):
+        """
+        Loads the given slices into the volumes and yields their ``DataElement`` instances, so that callers needing the
+        elements as well, ex: to render overlays, don't decode the slices twice. The elements are released once the
+        next one is requested
+
+        :param positions: ``slice`` or array of positions of the slices, all the slices by default
+        :param images: if ``False`` only the masks are loaded, without decoding the images
+        :return: generator of instances of ``DataElement``
+        """
+        positions = self._get_positions(positions)
+        loaded = self._get_loaded(images)
+
+        # lazy elements don't decode their image unless it is read, the pool is only worth it to decode images
+        lazy = not images or loaded[positions].all()
+        elements = self.dataset.create_elements([self.mappings[i] for i in positions], lazy=lazy)
+
+        for i, element in zip(positions, elements):
+            if not loaded[i]:
+                self._write_element(i, element, images)
+            yield element
+
+            element.release()
+
+    def _get_positions(self, positions):
+        return np.atleast_1d(np.arange(len(self))[positions if positions is not None else slice(None)])
+
+    def _get_loaded(self, images):
+        return self.masks_loaded & self.images_loaded if images else self.masks_loaded
+
+    def _write_element(self, i, element, images):
+        if images and not self.images_loaded[i]:
+            if self._images is None:
+                self._images = np.zeros(self.shape, dtype=element.image.dtype)
+            if element.image.shape != self.shape[1:]:
+                raise ValueError('Image {} has shape {} but the volume has shape {}'.format(
+                    element.dcm_path, element.image.shape, self.shape[1:]))
+
+            self._images[i] = element.image
+            self.images_loaded[i] = True
+
+        if not self.masks_loaded[i]:
+            self.targets[i][element.target_roi.slices] = element.target_roi.bitmap
+            if element.has_ocontour:
+                self.ocontour_masks[i][element.ocontour_roi.slices] = element.ocontour_roi.bitmap
+            self.masks_loaded[i] = True
+
+    @property
+    def images(self):
+        """Image volume of shape (Z, H, W), all the slices are loaded on first access"""
+        self.load()
+        return self._images
+
+    def get_slices(self, positions):
+        """
+        Gets the images and i-contour masks of the given slices, decoding only them
+
+        :param positions: ``slice`` or array of positions of the slices
+        :return: array of images of shape (N, H, W) and array of i-contour masks of shape (N, H, W)
+        """
+        self.load(positions)
+        return [self._images[positions], self.targets[positions]]
+
+    def get_masks(self, roi='icontour'):
+        """
+        Gets the mask volume of the given ROI, loading the masks of all the slices without decoding the images
+
+        :param roi: ``'icontour'`` or ``'ocontour'``
+        :return: boolean array of shape (Z, H, W). Slices without an o-contour have empty o-contour masks
+        """
+        self.load(images=False)
+        return self.targets if roi == 'icontour' else self.ocontour_masks
+
+    def get_areas(self, roi='icontour'):
+        """
+        Gets the area of the ROI of every slice in sq.mm, counting the pixels of its mask
+
+        :param roi: ``'icontour'`` or ``'ocontour'``
+        :return: array of shape (Z,). NaN for slices without an o-contour
+        """
+        areas = np.count_nonzero(self.get_masks(roi), axis=(1, 2)) * self.pixel_area
+        return areas if roi == 'icontour' else np.where(self.has_ocontour, areas, np.nan)
+
+    def get_relative_intensities(self, roi='icontour'):
+        """
+        Gets the relative intensity (%) of the ROI of every slice, the mean intensity of the ROI w.r.t the maximum
+        intensity of the slice
+
+        :param roi: ``'icontour'`` or ``'ocontour'``
+        :return: array of shape (Z,). NaN for slices with an empty ROI
+        """
+        masks = self.get_masks(roi)
+        images = self.images
+
+        sums = np.einsum('zij,zij->z', images, masks, dtype=float)
+        counts = np.count_nonzero(masks, axis=(1, 2))
+        maxima = images.max(axis=(1, 2)).astype(float)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / counts / maxima * 100, np.nan)
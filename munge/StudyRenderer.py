@@ -0,0 +1,135 @@
+"""Class to render the verification contact sheets of whole studies without an interactive figure"""
+import functools
+import os
+
+import numpy as np
+
+from .utils import parallel
+
+def _write_sheet(patient_id, renderer, output_dir):
+    """
+    Writes the contact sheet of the given study to ``output_dir``
+    """
+    filename = os.path.join(output_dir, '{}.png'.format(patient_id))
+    renderer.write_sheet(patient_id, filename)
+    return filename
+
+class StudyRenderer(object):
+    """
+    StudyRenderer class can be instantiated with the following args. The contact sheet of a study is a mosaic of the
+    i-contour overlays (see ``DataElement.get_image_icontour_overlay``) of all its slices, sorted by dcm_num, composed
+    as a single uint8 array. The sheets are written to PNG files with the Agg backend of matplotlib, so no display and
+    no ``pyplot`` state is needed, and the studies are rendered in parallel if ``workers`` is set
+
+    - **parameters**, **types**, **return** and **return types**::
+    :param dataset: instance of ``Dataset`` class
+    :param columns: number of slices in a row of the sheet
+    :param window: size of bounding box around the i-contour of every slice
+    :param patch_color: [r, g, b] value of the color in which the i-contour is overlaid
+    :param levels: intensity window of the images, see ``image.to_uint8``
+    :param spacing: number of background pixels between the slices
+    :param labels: if ``True`` the dcm_num of every slice is written on its overlay
+    :param workers: number of workers rendering the studies in parallel. ``None`` renders them serially
+    :param backend: ``'thread'`` or ``'process'`` pool used when ``workers`` is set
+    :type dataset: Dataset
+    :type columns: int
+    :type window: int
+    :type patch_color: list
+    :type levels: string or tuple
+    :type spacing: int
+    :type labels: bool
+    :type workers: int
+    :type backend: string
+    """
+    def __init__(self, dataset, columns=6, window=30, patch_color=[255, 0, 0], levels='auto', spacing=4, labels=True,
+                 workers=None, backend='process'):
+        self.dataset = dataset
+        self.columns = columns
+        self.window = window
+        self.patch_color = patch_color
+        self.levels = levels
+        self.spacing = spacing
+        self.labels = labels
+        self.workers = workers
+        self.backend = backend
+
+    def render_sheet(self, patient_id):
+        """
+        Composes the contact sheet of the given study. Every slice gets a cell of the size of the largest overlay of the
+        study, so there is no limit on the number of slices
+
+        :param patient_id: unique ID of the study
+        :return: uint8 array of shape (H, W, 3) and a list of (row, column, dcm_num) of the top left corner of every
+            slice in the sheet
+        """
+        elements = sorted(self.dataset.get_by_study(patient_id), key=lambda element: element.dcm_num)
+
+        overlays = []
+        for element in elements:
+            overlays.append((element.dcm_num, element.get_image_icontour_overlay(self.window, self.patch_color,
+                                                                                 self.levels)))
+            if element.lazy:
+                element.release()
+
+        if not overlays:
+            return np.zeros((0, 0, 3), dtype=np.uint8), []
+
+        cell_height = max(overlay.shape[0] for _, overlay in overlays) + self.spacing
+        cell_width = max(overlay.shape[1] for _, overlay in overlays) + self.spacing
+        rows = -(-len(overlays) // self.columns)
+        columns = min(len(overlays), self.columns)
+
+        sheet = np.zeros((rows * cell_height - self.spacing, columns * cell_width - self.spacing, 3), dtype=np.uint8)
+
+        positions = []
+        for i, (dcm_num, overlay) in enumerate(overlays):
+            top, left = (i // self.columns) * cell_height, (i % self.columns) * cell_width
+            sheet[top:top + overlay.shape[0], left:left + overlay.shape[1]] = overlay
+            positions.append((top, left, dcm_num))
+
+        return sheet, positions
+
+    def write_sheet(self, patient_id, filename):
+        """
+        Renders the contact sheet of the given study and writes it to a PNG file, one pixel of the file per pixel of
+        the sheet
+
+        :param patient_id: unique ID of the study
+        :param filename: path of the PNG file
+        """
+        # the Agg canvas is used directly instead of pyplot, which keeps no global state and needs no display
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        sheet, positions = self.render_sheet(patient_id)
+        height, width = sheet.shape[:2]
+        dpi = 100
+
+        # the canvas truncates its size in pixels, the extra fraction keeps the float division from losing one
+        fig = Figure(figsize=((max(width, 1) + 0.1) / dpi, (max(height, 1) + 0.1) / dpi), dpi=dpi)
+        FigureCanvasAgg(fig)
+        if sheet.size:
+            fig.figimage(sheet, origin='upper')
+
+        if self.labels:
+            for top, left, dcm_num in positions:
+                fig.text((left + 2) / width, 1 - (top + 2) / height, '{}.dcm'.format(dcm_num), color='yellow',
+                         fontsize=8, horizontalalignment='left', verticalalignment='top')
+
+        fig.savefig(filename, dpi=dpi)
+
+    def write_sheets(self, output_dir, patient_ids=None):
+        """
+        Writes the contact sheets of the given studies to ``<output_dir>/<patient_id>.png``
+
+        :param output_dir: directory to write the sheets to
+        :param patient_ids: IDs of the studies to render, all the studies by default
+        :return: list of the paths of the written files
+        """
+        if patient_ids is None:
+            patient_ids = self.dataset.index.patient_ids
+
+        os.makedirs(output_dir, exist_ok=True)
+
+        write_sheet = functools.partial(_write_sheet, renderer=self, output_dir=output_dir)
+        return list(parallel.imap_ordered(write_sheet, patient_ids, workers=self.workers, backend=self.backend))
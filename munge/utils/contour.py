@@ -1,43 +1,204 @@
 """Contour related util functions"""
+import os
 
 import numpy as np
-from PIL import Image, ImageDraw
 
 def parse_contour_file(filename):
     """Parse the given contour filename
 
     :param filename: filepath to the contourfile to parse
-    :return: list of tuples holding x, y coordinates of the contour
+    :return: array of shape (N, 2) holding x, y coordinates of the contour
     """
 
-    coords_lst = []
+    # every line is an "x y" pair, so the whole file can be read as one flat sequence of floats
+    return np.fromfile(filename, dtype=float, sep=' ').reshape(-1, 2)
 
-    with open(filename, 'r') as infile:
-        for line in infile:
-            coords = line.strip().split()
 
-            x_coord = float(coords[0])
-            y_coord = float(coords[1])
-            coords_lst.append((x_coord, y_coord))
+def parse_contour_dir(contour_dir):
+    """Parse all the contour files of the given directory into one array
 
-    return coords_lst
+    :param contour_dir: path of the directory having the contour files
+    :return: filenames sorted by name, array of shape (M, 2) with the coordinates of all the contours concatenated in
+     the order of the filenames, and array of N + 1 offsets such that the contour of the i-th file is
+     coords[offsets[i]:offsets[i + 1]]
+    """
+
+    filenames = sorted(os.listdir(contour_dir))
+    contours = [parse_contour_file(os.path.join(contour_dir, filename)) for filename in filenames]
+
+    offsets = np.zeros(len(contours) + 1, dtype=int)
+    np.cumsum([len(c) for c in contours], out=offsets[1:])
+
+    coords = np.concatenate(contours) if contours else np.empty((0, 2))
+    return filenames, coords, offsets
 
 
-def poly_to_mask(polygon, width, height):
+def poly_to_mask(polygon, width, height, out=None):
     """Convert polygon to mask
 
-    :param polygon: list of pairs of x, y coords [(x1, y1), (x2, y2), ...]
+    The polygon is rasterized with the same rules as ``PIL.ImageDraw.polygon(xy, fill=1, outline=0)``: the vertices
+    are truncated to whole pixels, the rows are filled by scanlines through the pixel centers and the outline is
+    cleared afterwards. Only the bounding box of the polygon is touched.
+
+    :param polygon: array of shape (N, 2) or list of pairs of x, y coords [(x1, y1), (x2, y2), ...]
      in units of pixels
     :param width: scalar image width
     :param height: scalar image height
+    :param out: optional preallocated boolean array of shape (height, width) to write the mask to
     :return: Boolean mask of shape (height, width)
     """
 
-    # http://stackoverflow.com/a/3732128/1410871
-    img = Image.new(mode='L', size=(width, height), color=0)
-    ImageDraw.Draw(img).polygon(xy=polygon, outline=0, fill=1)
-    mask = np.array(img).astype(bool)
-    return mask
+    if out is None:
+        out = np.zeros((height, width), dtype=bool)
+    else:
+        out.fill(False)
+
+    starts, stops = _get_edges(polygon)
+    _fill_polygon(out, starts, stops)
+    _clear_outline(out, starts, stops)
+
+    return out
+
+
+def poly_to_cropped_mask(polygon, width, height):
+    """Convert polygon to the mask of its bounding box only
+
+    The result is the same as cropping the bounding box from ``poly_to_mask``, without allocating the full mask.
+
+    :param polygon: array of shape (N, 2) or list of pairs of x, y coords in units of pixels
+    :param width: scalar image width
+    :param height: scalar image height
+    :return: (row, column) of the top left corner of the bounding box within the image and Boolean mask of the
+     bounding box
+    """
+
+    starts, stops = _get_edges(polygon)
+    (min_x, min_y), (max_x, max_y) = starts.min(axis=0), starts.max(axis=0)
+
+    # the filled spans and the outline never leave the box of the truncated vertices
+    left, top = max(min_x, 0), max(min_y, 0)
+    right, bottom = min(max_x + 1, width), min(max_y + 1, height)
+
+    if left >= right or top >= bottom:
+        return (0, 0), np.zeros((0, 0), dtype=bool)
+
+    mask = np.zeros((bottom - top, right - left), dtype=bool)
+    _fill_polygon(mask, starts, stops, origin=(top, left))
+    _clear_outline(mask, starts, stops, origin=(top, left))
+
+    return (top, left), mask
+
+
+def polys_to_masks(polygons, width, height, out=None):
+    """Convert a batch of polygons to a stack of masks
+
+    :param polygons: sequence of N polygons, each an array of shape (M, 2) of x, y coords in units of pixels
+    :param width: scalar image width
+    :param height: scalar image height
+    :param out: optional preallocated boolean array of shape (N, height, width) to write the masks to
+    :return: Boolean masks of shape (N, height, width)
+    """
+
+    if out is None:
+        out = np.zeros((len(polygons), height, width), dtype=bool)
+
+    for polygon, mask in zip(polygons, out):
+        poly_to_mask(polygon, width, height, out=mask)
+
+    return out
+
+
+def _get_edges(polygon):
+    """
+    Gets the start and stop vertices of the edges of the polygon, truncated to whole pixels like PIL does
+    """
+    vertices = np.trunc(np.asarray(polygon, dtype=float).reshape(-1, 2)).astype(int)
+    if len(vertices) < 2:
+        raise ValueError('A polygon needs at least two vertices')
+
+    # like PIL, the closing edge is only added when the polygon is not closed already
+    if not np.array_equal(vertices[0], vertices[-1]):
+        vertices = np.vstack([vertices, vertices[:1]])
+
+    return vertices[:-1], vertices[1:]
+
+
+def _fill_polygon(mask, starts, stops, origin=(0, 0)):
+    """
+    Fills the inside of the polygon given by its edges with the scanline rule of PIL: every row is sampled at its
+    center, so horizontal edges never cross a scanline and no scanline ever hits a vertex. ``mask`` is the window of
+    the image starting at ``origin``, the crossings are still computed in image coordinates so that they round the same
+    """
+    (origin_top, origin_left), (height, width) = origin, mask.shape
+
+    (x0, y0), (x1, y1) = starts.T, stops.T
+    sloped = y0 != y1
+    x0, y0, x1, y1 = x0[sloped], y0[sloped], x1[sloped], y1[sloped]
+    if not len(x0):
+        return
+
+    # every edge crosses the rows ymin .. ymax - 1, clipped to the window
+    row_min = np.clip(np.minimum(y0, y1), origin_top, origin_top + height)
+    row_max = np.clip(np.maximum(y0, y1), origin_top, origin_top + height)
+    counts = row_max - row_min
+    if not counts.sum():
+        return
+
+    edges = np.repeat(np.arange(len(x0)), counts)
+    rows = row_min[edges] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    # single precision, in the same order of operations as PIL, so that the spans round the same way
+    slopes = (x1 - x0).astype(np.float32) / (y1 - y0).astype(np.float32)
+    crossings = ((rows + np.float32(0.5)).astype(np.float32) - y0[edges].astype(np.float32)) * slopes[edges] \
+        + x0[edges].astype(np.float32)
+
+    # a closed polygon crosses every scanline an even number of times, so consecutive crossings pair up into spans
+    order = np.lexsort((crossings, rows))
+    rows, crossings = rows[order][::2], crossings[order].astype(float)
+    span_starts = np.maximum(np.ceil(crossings[::2] - 0.5).astype(int), origin_left)
+    span_stops = np.minimum(np.floor(crossings[1::2] + 0.5).astype(int), origin_left + width - 1)
+
+    visible = span_starts <= span_stops
+    rows, span_starts, span_stops = rows[visible], span_starts[visible], span_stops[visible]
+    if not len(rows):
+        return
+
+    # paint the spans with a running sum over the bounding box only
+    top, left = rows.min(), span_starts.min()
+    bottom, right = rows.max() + 1, span_stops.max() + 1
+
+    coverage = np.zeros((bottom - top, right - left + 1), dtype=int)
+    np.add.at(coverage, (rows - top, span_starts - left), 1)
+    np.add.at(coverage, (rows - top, span_stops + 1 - left), -1)
+
+    window = mask[top - origin_top:bottom - origin_top, left - origin_left:right - origin_left]
+    np.greater(np.cumsum(coverage, axis=1)[:, :-1], 0, out=window)
+
+
+def _clear_outline(mask, starts, stops, origin=(0, 0)):
+    """
+    Clears the pixels of the outline of the polygon, drawn with the Bresenham lines of PIL which leave out the last
+    pixel of every edge. ``mask`` is the window of the image starting at ``origin``
+    """
+    (origin_top, origin_left), (height, width) = origin, mask.shape
+
+    deltas = stops - starts
+    lengths = np.abs(deltas).max(axis=1)
+    if not lengths.sum():
+        return
+
+    edges = np.repeat(np.arange(len(starts)), lengths)
+    steps = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    # along the major axis the line advances one pixel per step, along the minor axis it advances when the
+    # accumulated error crosses half a pixel
+    major = lengths[edges]
+    offsets = (2 * steps[:, None] * np.abs(deltas[edges]) + major[:, None]) // (2 * major[:, None])
+    points = starts[edges] + np.sign(deltas[edges]) * offsets
+
+    x, y = points[:, 0] - origin_left, points[:, 1] - origin_top
+    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    mask[y[inside], x[inside]] = False
 
 def get_dcm_num_for_contour(contour_file_name):
     """Gets the DICOM series number for a given contour file name or full file path
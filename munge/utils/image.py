@@ -37,6 +37,36 @@ def parse_dicom_file(filename):
     except InvalidDicomError:
         return None
 
+def parse_dicom_header(filename):
+    """Parse the header of the given DICOM filename without reading its pixel data
+
+    :param filename: filepath to the DICOM file to parse
+    :return: dictionary with DICOM header data. ``width`` and ``height`` match the ones of ``parse_dicom_file``
+    """
+
+    try:
+        dcm = dicom.read_file(filename, stop_before_pixels=True)
+    except InvalidDicomError:
+        return None
+
+    return {
+        'rows': int(dcm.Rows),
+        'columns': int(dcm.Columns),
+        'width': int(dcm.Rows),
+        'height': int(dcm.Columns),
+        'resolution': get_dcm_resolution(dcm),
+        'slope': float(getattr(dcm, 'RescaleSlope', 1.0)),
+        'intercept': float(getattr(dcm, 'RescaleIntercept', 0.0)),
+        'series_uid': _get_optional(dcm, 'SeriesInstanceUID', str),
+        'series_number': _get_optional(dcm, 'SeriesNumber', int),
+        'instance_number': _get_optional(dcm, 'InstanceNumber', int),
+        'slice_location': _get_optional(dcm, 'SliceLocation', float)
+    }
+
+def _get_optional(dcm, name, cast):
+    value = getattr(dcm, name, None)
+    return None if value is None or value == '' else cast(value)
+
 def get_dcm_resolution(dcm_img):
     """
     Gets the resolution of the DICOM image
@@ -47,13 +77,92 @@ def get_dcm_resolution(dcm_img):
     pixel_spacing = dcm_img.data_element('PixelSpacing').value
     return [float(pixel_spacing[0]), float(pixel_spacing[1])]
 
-def grayscale_to_rgb(img_raw):
+def get_levels(img, levels='auto'):
+    """
+    Gets the intensity window used to convert the image to uint8
+
+    :param img: the raw grayscale image
+    :param levels: ``'auto'`` for the minimum and maximum of the image, or a (low, high) pair which is returned as is
+    :return: (low, high) pair
+    """
+    if levels == 'auto':
+        return img.min(), img.max()
+    return levels
+
+def to_uint8(img_raw, levels=None, out=None):
+    """
+    Converts the given grayscale image to uint8. Without ``levels`` the intensities are cast as they are, values outside
+    of [0, 255] wrapping around. With ``levels`` the intensities from low to high are scaled linearly to [0, 255] and
+    the ones outside of the window are clipped
+
+    :param img_raw: the raw grayscale image, or stack of images
+    :param levels: ``None``, ``'auto'`` or a (low, high) pair, see ``get_levels``
+    :param out: optional uint8 array of the same shape to write the result to
+    :return: uint8 image
     """
-    Converts the given grayscale image to a three channel image
+    if out is None:
+        out = np.empty(np.shape(img_raw), dtype=np.uint8)
 
-    :param img_raw: the raw grayscale image
+    if levels is None:
+        out[...] = img_raw
+        return out
+
+    low, high = get_levels(img_raw, levels)
+    scale = 255.0 / (high - low) if high > low else 0.0
+
+    scaled = np.subtract(img_raw, low, dtype=np.float32)
+    scaled *= scale
+    np.clip(scaled, 0, 255, out=scaled)
+    np.rint(scaled, out=scaled)
+    out[...] = scaled
+    return out
+
+def grayscale_to_rgb(img_raw, levels=None, out=None):
+    """
+    Converts the given grayscale image to a three channel image. Without ``out`` the result is a read-only view
+    repeating the uint8 image along the channels, copy it before drawing on it
+
+    :param img_raw: the raw grayscale image, or stack of images
+    :param levels: ``None``, ``'auto'`` or a (low, high) pair, see ``to_uint8``
+    :param out: optional uint8 array of the shape of the image with an extra axis of 3 channels to write the result to
     :return: 3 Channel RGB image
     """
-    img = img_raw.copy()
-    img.resize((img.shape[0], img.shape[1], 1))
-    return np.repeat(img.astype(np.uint8), 3, 2)
+    if out is None:
+        gray = to_uint8(img_raw, levels)
+        return np.broadcast_to(gray[..., None], gray.shape + (3,))
+
+    if levels is None:
+        out[...] = np.asarray(img_raw)[..., None]
+    else:
+        to_uint8(img_raw, levels, out=out[..., 0])
+        out[..., 1:] = out[..., :1]
+    return out
+
+def paint_masks(rgb_img, masks_and_colors):
+    """
+    Paints the pixels of the masks in place with their colors, the later masks over the earlier ones
+
+    :param rgb_img: writable 3 channel image, or stack of images
+    :param masks_and_colors: list of (boolean mask of the shape of the image, [r, g, b] color) pairs
+    :return: the painted image
+    """
+    for mask, color in masks_and_colors:
+        np.copyto(rgb_img, np.asarray(color, dtype=rgb_img.dtype), where=np.asarray(mask)[..., None])
+    return rgb_img
+
+def overlay_masks(images, masks_and_colors, levels=None, out=None):
+    """
+    Converts the images to three channels and paints the masks over them. A whole stack is rendered at once and written
+    to ``out`` if given, so that batches can be rendered into the same buffer again and again
+
+    :param images: grayscale image of shape (H, W) or stack of images of shape (N, H, W)
+    :param masks_and_colors: list of (boolean masks of the shape of the images, [r, g, b] color) pairs
+    :param levels: ``None``, ``'auto'`` or a (low, high) pair, see ``to_uint8``
+    :param out: optional uint8 array of shape (H, W, 3) or (N, H, W, 3) to write the result to
+    :return: uint8 array of the shape of the images with an extra axis of 3 channels
+    """
+    if out is None:
+        out = np.empty(np.shape(images) + (3,), dtype=np.uint8)
+
+    grayscale_to_rgb(images, levels, out=out)
+    return paint_masks(out, masks_and_colors)
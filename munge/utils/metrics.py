@@ -0,0 +1,140 @@
+"""Segmentation metric util functions working on boolean masks or stacks of them"""
+import numpy as np
+from scipy import ndimage
+
+def get_confusion_counts(reference, predicted):
+    """
+    Counts the true positive, false positive, false negative and true negative pixels of the predicted masks
+
+    :param reference: boolean ground truth mask of shape (H, W) or stack of masks of shape (N, H, W)
+    :param predicted: boolean predicted mask(s) of the same shape
+    :return: Dict with ``tp``, ``fp``, ``fn`` and ``tn`` counts, scalars for single masks and arrays of shape (N,) for
+        stacks
+    """
+    reference = np.asarray(reference, dtype=bool)
+    predicted = np.asarray(predicted, dtype=bool)
+    if reference.shape != predicted.shape:
+        raise ValueError('Masks of shape {} and {} cannot be compared'.format(reference.shape, predicted.shape))
+
+    axes = (-2, -1)
+    size = reference.shape[-2] * reference.shape[-1]
+
+    tp = np.count_nonzero(reference & predicted, axis=axes)
+    reference_count = np.count_nonzero(reference, axis=axes)
+    predicted_count = np.count_nonzero(predicted, axis=axes)
+
+    fp = predicted_count - tp
+    fn = reference_count - tp
+    return {'tp': tp, 'fp': fp, 'fn': fn, 'tn': size - tp - fp - fn}
+
+def get_overlap_measures(reference, predicted):
+    """
+    Gets the Jaccard and Dice coefficients, sensitivity and specificity of the predicted masks. A ratio whose
+    denominator is 0, ex: the Jaccard coefficient of two empty masks, is 1 as the masks agree completely
+
+    :param reference: boolean ground truth mask of shape (H, W) or stack of masks of shape (N, H, W)
+    :param predicted: boolean predicted mask(s) of the same shape
+    :return: Dict with ``jaccard``, ``dice``, ``sensitivity`` and ``specificity``, scalars for single masks and arrays
+        of shape (N,) for stacks
+    """
+    counts = get_confusion_counts(reference, predicted)
+    tp, fp, fn, tn = counts['tp'], counts['fp'], counts['fn'], counts['tn']
+
+    return {
+        'jaccard': _ratio(tp, tp + fp + fn),
+        'dice': _ratio(2 * tp, 2 * tp + fp + fn),
+        'sensitivity': _ratio(tp, tp + fn),
+        'specificity': _ratio(tn, tn + fp)
+    }
+
+def jaccard_coeff(reference, predicted):
+    """
+    Gets the Jaccard coefficient, intersection over union, of the predicted masks
+
+    :param reference: boolean ground truth mask of shape (H, W) or stack of masks of shape (N, H, W)
+    :param predicted: boolean predicted mask(s) of the same shape
+    :return: Jaccard coefficient, scalar or array of shape (N,)
+    """
+    counts = get_confusion_counts(reference, predicted)
+    return _ratio(counts['tp'], counts['tp'] + counts['fp'] + counts['fn'])
+
+def dice_coeff(reference, predicted):
+    """
+    Gets the Dice coefficient of the predicted masks
+
+    :param reference: boolean ground truth mask of shape (H, W) or stack of masks of shape (N, H, W)
+    :param predicted: boolean predicted mask(s) of the same shape
+    :return: Dice coefficient, scalar or array of shape (N,)
+    """
+    counts = get_confusion_counts(reference, predicted)
+    return _ratio(2 * counts['tp'], 2 * counts['tp'] + counts['fp'] + counts['fn'])
+
+def get_surface_distances(reference, predicted, spacing=None):
+    """
+    Gets the distances of the boundary pixels of each mask to the nearest boundary pixel of the other mask
+
+    :param reference: boolean ground truth mask of shape (H, W)
+    :param predicted: boolean predicted mask of shape (H, W)
+    :param spacing: optional (row, column) size of a pixel, ex: in mm. Distances are in pixels without it
+    :return: distances from the predicted boundary to the reference and from the reference boundary to the predicted,
+        or ``None`` if either mask is empty
+    """
+    reference = np.asarray(reference, dtype=bool)
+    predicted = np.asarray(predicted, dtype=bool)
+
+    if not reference.any() or not predicted.any():
+        return None
+
+    reference_surface = _get_surface(reference)
+    predicted_surface = _get_surface(predicted)
+
+    # distance of every pixel to the nearest boundary pixel, read at the boundary of the other mask
+    to_reference = ndimage.distance_transform_edt(~reference_surface, sampling=spacing)
+    to_predicted = ndimage.distance_transform_edt(~predicted_surface, sampling=spacing)
+
+    return to_reference[predicted_surface], to_predicted[reference_surface]
+
+def hausdorff_distance(reference, predicted, spacing=None, percentile=100):
+    """
+    Gets the symmetric Hausdorff distance between the boundaries of the masks. With ``percentile`` below 100 the
+    distance is that percentile of the boundary distances instead of their maximum, ex: 95 for the robust HD95
+
+    :param reference: boolean ground truth mask of shape (H, W) or stack of masks of shape (N, H, W)
+    :param predicted: boolean predicted mask(s) of the same shape
+    :param spacing: optional (row, column) size of a pixel, ex: in mm. Distances are in pixels without it
+    :param percentile: percentile of the boundary distances
+    :return: distance, scalar or array of shape (N,). NaN where either mask is empty
+    """
+    return _get_distance_measure(reference, predicted, spacing, lambda d: np.percentile(d, percentile))
+
+def mean_surface_distance(reference, predicted, spacing=None):
+    """
+    Gets the symmetric mean distance between the boundaries of the masks
+
+    :param reference: boolean ground truth mask of shape (H, W) or stack of masks of shape (N, H, W)
+    :param predicted: boolean predicted mask(s) of the same shape
+    :param spacing: optional (row, column) size of a pixel, ex: in mm. Distances are in pixels without it
+    :return: distance, scalar or array of shape (N,). NaN where either mask is empty
+    """
+    return _get_distance_measure(reference, predicted, spacing, np.mean)
+
+def _get_distance_measure(reference, predicted, spacing, reduce):
+    reference = np.asarray(reference, dtype=bool)
+    predicted = np.asarray(predicted, dtype=bool)
+
+    if reference.ndim == 3:
+        return np.array([_get_distance_measure(r, p, spacing, reduce) for r, p in zip(reference, predicted)])
+
+    distances = get_surface_distances(reference, predicted, spacing)
+    if distances is None:
+        return np.nan
+
+    return float(reduce(np.concatenate(distances)))
+
+def _get_surface(mask):
+    return mask & ~ndimage.binary_erosion(mask)
+
+def _ratio(numerator, denominator):
+    numerator, denominator = np.asarray(numerator, dtype=float), np.asarray(denominator, dtype=float)
+    ratio = np.divide(numerator, denominator, out=np.ones_like(numerator), where=denominator > 0)
+    return ratio if ratio.ndim else float(ratio)
@@ -5,8 +5,6 @@ import csv
 import os
 
 import numpy as np
-from sklearn.mixture import GaussianMixture
-from scipy.stats import norm
 
 def get_app_config(config_file):
     """
@@ -18,13 +16,16 @@ def get_app_config(config_file):
 
     return json.load(open(config_file))
 
-def get_uuid():
+def get_uuid(name=None):
     """
-    Generates and returns a random GUID
+    Generates and returns a random GUID, or the GUID derived from the given name which is the same in every run
 
-    :return: Random GUID V4
+    :param name: optional name, ex: a file path, to derive the GUID from
+    :return: Random GUID V4, or name-based GUID V5 if a name is given
     """
 
+    if name is not None:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, name))
     return str(uuid.uuid4())
 
 def csv2dict(csv_file):
@@ -53,16 +54,16 @@ def get_bounding_box_coords(contour, window=30):
     """
     Given a contour and window, get the min and max co-ordinates of a bounding box around that window
 
-    :param contour: Array of co-ordinates defining the contour
+    :param contour: Array of shape (N, 2) or list of co-ordinates defining the contour
     :param window: The window size of the bounding box
     :return: min_x, max_x, min_y and max_y of the bounding box
     """
-    x_values = [c[0] for c in contour]
-    y_values = [c[1] for c in contour]
+    contour = np.asarray(contour)
+    (min_x, min_y), (max_x, max_y) = contour.min(axis=0), contour.max(axis=0)
 
-    min_x = int(min(x_values)) - window
-    max_x = int(max(x_values)) + window
-    min_y = int(min(y_values)) - window
-    max_y = int(max(y_values)) + window
+    min_x = int(min_x) - window
+    max_x = int(max_x) + window
+    min_y = int(min_y) - window
+    max_y = int(max_y) + window
 
     return [min_x, max_x, min_y, max_y]
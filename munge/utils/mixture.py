@@ -0,0 +1,110 @@
+"""Gaussian mixture model util functions for 1-D intensities given as weighted histogram bins"""
+import numpy as np
+
+def fit_weighted_gmm(values, counts, n_components=2, init=None, max_iter=100, tol=1e-3, reg_covar=1e-6):
+    """
+    Fits a 1-D Gaussian mixture model with expectation maximization on histogram bins. Every bin counts as many times
+    as its count, so the result is that of a fit on the pixels while the cost only depends on the number of bins
+
+    :param values: array of shape (B,) with the intensity of every bin
+    :param counts: array of shape (B,) with the number of pixels in every bin
+    :param n_components: number of components of the mixture
+    :param init: optional (means, variances, weights) to start from, ex: the fit of a neighbouring slice. Without it
+        the components are initialized with a weighted k-means
+    :param max_iter: maximum number of EM iterations
+    :param tol: the fit stops when the average log-likelihood per pixel improves by less than this
+    :param reg_covar: non-negative regularization added to the variances
+    :return: means, variances and weights of the components, each of shape (n_components,) and sorted by the means
+    """
+    values = np.asarray(values, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+
+    if init is None:
+        means, variances, weights = _init_kmeans(values, counts, n_components, reg_covar)
+    else:
+        means, variances, weights = [np.array(params, dtype=float) for params in init]
+        if len(means) != n_components:
+            raise ValueError('The initial fit has {} components instead of {}'.format(len(means), n_components))
+
+    total = counts.sum()
+    lower_bound = -np.inf
+
+    for _ in range(max_iter):
+        # E-step: responsibilities of every component for every bin, scaled by the count of the bin
+        log_prob = _get_log_prob(values, means, variances, weights)
+        log_norm = _logsumexp(log_prob)
+        resp = np.exp(log_prob - log_norm[:, None]) * counts[:, None]
+
+        previous_lower_bound, lower_bound = lower_bound, counts.dot(log_norm) / total
+
+        # M-step: weighted moments of the bins
+        nk = resp.sum(axis=0) + 10 * np.finfo(float).eps
+        means = values.dot(resp) / nk
+        variances = ((values[:, None] - means) ** 2 * resp).sum(axis=0) / nk + reg_covar
+        weights = nk / total
+
+        if abs(lower_bound - previous_lower_bound) < tol:
+            break
+
+    order = np.argsort(means)
+    return means[order], variances[order], weights[order]
+
+def log_likelihood(values, counts, means, variances, weights):
+    """
+    Gets the total log-likelihood of the pixels of the histogram under the given mixture
+
+    :param values: array of shape (B,) with the intensity of every bin
+    :param counts: array of shape (B,) with the number of pixels in every bin
+    :param means: means of the components
+    :param variances: variances of the components
+    :param weights: weights of the components
+    :return: log-likelihood
+    """
+    values = np.asarray(values, dtype=float)
+    log_prob = _get_log_prob(values, np.asarray(means), np.asarray(variances), np.asarray(weights))
+    return float(np.asarray(counts, dtype=float).dot(_logsumexp(log_prob)))
+
+def _get_log_prob(values, means, variances, weights):
+    """
+    Gets the weighted log probability densities of shape (B, K) of every bin under every component
+    """
+    return -0.5 * (np.log(2 * np.pi * variances) + (values[:, None] - means) ** 2 / variances) + np.log(weights)
+
+def _logsumexp(log_prob):
+    top = log_prob.max(axis=1)
+    return top + np.log(np.exp(log_prob - top[:, None]).sum(axis=1))
+
+def _init_kmeans(values, counts, n_components, reg_covar, max_iter=20):
+    """
+    Initializes the components with a weighted 1-D k-means started from the quantiles of the histogram
+    """
+    order = np.argsort(values)
+    values, counts = values[order], counts[order]
+
+    cdf = np.cumsum(counts) / counts.sum()
+    quantiles = (np.arange(n_components) + 0.5) / n_components
+    centers = values[np.minimum(np.searchsorted(cdf, quantiles), len(values) - 1)]
+
+    for _ in range(max_iter):
+        labels = np.abs(values[:, None] - centers).argmin(axis=1)
+        mass = np.bincount(labels, weights=counts, minlength=n_components)
+
+        # empty clusters keep their center
+        sums = np.bincount(labels, weights=counts * values, minlength=n_components)
+        new_centers = np.where(mass > 0, sums / np.maximum(mass, 1e-12), centers)
+
+        if np.array_equal(new_centers, centers):
+            break
+        centers = new_centers
+
+    labels = np.abs(values[:, None] - centers).argmin(axis=1)
+    mass = np.bincount(labels, weights=counts, minlength=n_components)
+    squares = np.bincount(labels, weights=counts * (values - centers[labels]) ** 2, minlength=n_components)
+
+    # an empty cluster starts as wide as the whole histogram, so that EM can still move it
+    mean = np.average(values, weights=counts)
+    spread = np.average((values - mean) ** 2, weights=counts)
+
+    variances = np.where(mass > 0, squares / np.maximum(mass, 1e-12), spread) + reg_covar
+    weights = np.maximum(mass, 1e-12) / counts.sum()
+    return centers, variances, weights
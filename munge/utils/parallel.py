@@ -0,0 +1,80 @@
+"""Parallel execution util functions"""
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+EXECUTORS = {
+    'thread': ThreadPoolExecutor,
+    'process': ProcessPoolExecutor
+}
+
+def get_executor(workers, backend='thread'):
+    """
+    Creates a pool executor for the given backend
+
+    :param workers: number of workers in the pool
+    :param backend: ``'thread'`` or ``'process'``
+    :return: instance of ``concurrent.futures.Executor``
+    """
+    if backend not in EXECUTORS:
+        raise ValueError('Unknown backend {}. Supported backends are {}'.format(backend, sorted(EXECUTORS)))
+
+    return EXECUTORS[backend](max_workers=workers)
+
+def imap_ordered(func, iterable, workers=None, backend='thread', window=None, on_result=None):
+    """
+    Applies ``func`` to every item of ``iterable`` using a pool of workers and yields the results in the order of the
+    input. Only ``window`` items are in flight at a time, so the results are streamed instead of collected up-front.
+    With no ``workers`` the items are processed serially in the calling thread.
+
+    For the ``'process'`` backend ``func``, the items and the results must be picklable, so ``func`` has to be defined
+    at module level (or be a ``functools.partial`` of such a function).
+
+    :param func: function to apply
+    :param iterable: items to apply the function on
+    :param workers: number of workers, ``None`` or ``0`` to run serially
+    :param backend: ``'thread'`` or ``'process'``
+    :param window: maximum number of items in flight, defaults to twice the number of workers
+    :param on_result: optional function called with every result before it is yielded, along with the time spent
+        waiting for it and the number of results that were ready when it was requested
+    :return: generator of the results of ``func``
+    """
+    if not workers:
+        for item in iterable:
+            start = time.time()
+            result = func(item)
+            if on_result is not None:
+                on_result(result, time.time() - start, 0)
+            yield result
+        return
+
+    window = window or 2 * workers
+    pending = deque()
+
+    with get_executor(workers, backend) as executor:
+        try:
+            for item in iterable:
+                pending.append(executor.submit(func, item))
+
+                if len(pending) >= window:
+                    yield _get_result(pending, on_result)
+
+            while pending:
+                yield _get_result(pending, on_result)
+        finally:
+            # the consumer stopped early, don't wait for the results nobody will read
+            for future in pending:
+                future.cancel()
+
+def _get_result(pending, on_result):
+    future = pending.popleft()
+    if on_result is None:
+        return future.result()
+
+    ready = int(future.done()) + sum(f.done() for f in pending)
+
+    start = time.time()
+    result = future.result()
+    on_result(result, time.time() - start, ready)
+
+    return result
@@ -0,0 +1,175 @@
+"""Morphological post-processing util functions for thresholded masks"""
+import functools
+
+import numpy as np
+from scipy import ndimage
+
+DEFAULT_PIPELINE = (('dilate', {'radius': 3}),)
+
+def get_pipeline(postprocess):
+    """
+    Normalizes the given post-processing setting to a hashable pipeline
+
+    :param postprocess: ``True`` for ``DEFAULT_PIPELINE``, ``False`` or ``None`` for no post-processing, or a list of
+        steps, each either the name of an operation or a (name, Dict of parameters) pair, ex:
+        ``['fill_holes', ('erode', {'radius': 1}), 'largest_component']``
+    :return: tuple of (name, tuple of sorted (parameter, value) pairs)
+    """
+    if postprocess is True:
+        postprocess = DEFAULT_PIPELINE
+    if not postprocess:
+        return ()
+
+    pipeline = []
+    for step in postprocess:
+        name, params = (step, {}) if isinstance(step, str) else step
+        params = dict(params)
+
+        if name not in OPERATIONS:
+            raise ValueError('Unknown operation {}. Supported operations are {}'.format(name, sorted(OPERATIONS)))
+
+        pipeline.append((name, tuple(sorted(params.items()))))
+
+    return tuple(pipeline)
+
+def apply_pipeline(masks, postprocess=DEFAULT_PIPELINE):
+    """
+    Applies the post-processing pipeline to a mask or to a whole stack of masks at once. The operations only run on the
+    bounding box of the set pixels of the stack, grown by the reach of the pipeline, so the result is the same as
+    processing the full masks
+
+    :param masks: boolean mask of shape (H, W) or stack of masks of shape (N, H, W)
+    :param postprocess: pipeline, see ``get_pipeline``
+    :return: processed mask(s) of the same shape
+    """
+    masks = np.asarray(masks, dtype=bool)
+    stack = masks[None] if masks.ndim == 2 else masks
+    pipeline = get_pipeline(postprocess)
+
+    result = np.zeros_like(stack)
+
+    # every operation moves the boundary by at most its radius, the extra pixel keeps a background ring around the
+    # window so that holes are told apart from the outside
+    margin = sum(dict(params).get('radius', 1) for _, params in pipeline) + 1
+    window = _get_window(stack, margin)
+
+    if window is not None:
+        region = stack[window]
+        for name, params in pipeline:
+            region = OPERATIONS[name](region, **dict(params))
+        result[window] = region
+
+    return result[0] if masks.ndim == 2 else result
+
+@functools.lru_cache(maxsize=None)
+def get_disk(radius):
+    """
+    Gets the disk-shaped structural element of the given radius. The elements are cached, so they are read-only
+
+    :param radius: radius of the disk
+    :return: boolean array of shape (2 * radius + 1, 2 * radius + 1)
+    """
+    y, x = np.ogrid[-radius:radius + 1, -radius:radius + 1]
+    disk = x * x + y * y <= radius * radius
+    disk.flags.writeable = False
+    return disk
+
+def dilate(masks, radius=1):
+    """
+    Dilates every mask of the stack with a disk of the given radius
+
+    :param masks: stack of masks of shape (N, H, W)
+    :param radius: radius of the disk
+    :return: dilated masks
+    """
+    return ndimage.binary_dilation(masks, structure=get_disk(radius)[None])
+
+def erode(masks, radius=1):
+    """
+    Erodes every mask of the stack with a disk of the given radius. Pixels beyond the border count as set
+
+    :param masks: stack of masks of shape (N, H, W)
+    :param radius: radius of the disk
+    :return: eroded masks
+    """
+    return ndimage.binary_erosion(masks, structure=get_disk(radius)[None], border_value=1)
+
+def open_masks(masks, radius=1):
+    """
+    Opens every mask of the stack, an erosion followed by a dilation, which removes specks smaller than the disk
+
+    :param masks: stack of masks of shape (N, H, W)
+    :param radius: radius of the disk
+    :return: opened masks
+    """
+    return dilate(erode(masks, radius), radius)
+
+def close_masks(masks, radius=1):
+    """
+    Closes every mask of the stack, a dilation followed by an erosion, which fills cracks narrower than the disk
+
+    :param masks: stack of masks of shape (N, H, W)
+    :param radius: radius of the disk
+    :return: closed masks
+    """
+    return erode(dilate(masks, radius), radius)
+
+def fill_holes(masks):
+    """
+    Fills the holes of every mask of the stack
+
+    :param masks: stack of masks of shape (N, H, W)
+    :return: filled masks
+    """
+    # a 3-D fill would count the first and last masks as the border of the volume, so every mask is filled on its own
+    return np.array([ndimage.binary_fill_holes(mask) for mask in masks], dtype=bool).reshape(masks.shape)
+
+def largest_component(masks):
+    """
+    Keeps only the largest 8-connected component of every mask of the stack
+
+    :param masks: stack of masks of shape (N, H, W)
+    :return: masks with a single component
+    """
+    # label takes only structures of size 3 along every axis, setting only the middle plane keeps components from
+    # spanning two masks, so the whole stack is labelled in one pass
+    structure = np.zeros((3, 3, 3), dtype=bool)
+    structure[1] = True
+    labels, count = ndimage.label(masks, structure=structure)
+    if not count:
+        return masks.copy()
+
+    sizes = np.bincount(labels.ravel(), minlength=count + 1)
+
+    # every component lies in a single mask, find which one
+    mask_of_label = np.zeros(count + 1, dtype=int)
+    mask_of_label[labels.ravel()] = np.repeat(np.arange(len(masks)), labels[0].size)
+
+    # keep the label with the largest size per mask, ranking by size first and by label to break ties
+    ranks = sizes[1:] * (count + 1) + np.arange(1, count + 1)
+    best = np.zeros(len(masks), dtype=ranks.dtype)
+    np.maximum.at(best, mask_of_label[1:], ranks)
+    largest = best % (count + 1)
+
+    return (labels == largest[:, None, None]) & (largest[:, None, None] > 0)
+
+OPERATIONS = {
+    'dilate': dilate,
+    'erode': erode,
+    'open': open_masks,
+    'close': close_masks,
+    'fill_holes': fill_holes,
+    'largest_component': largest_component
+}
+
+def _get_window(stack, margin):
+    rows = np.flatnonzero(stack.any(axis=(0, 2)))
+    columns = np.flatnonzero(stack.any(axis=(0, 1)))
+
+    if not len(rows):
+        return None
+
+    height, width = stack.shape[1:]
+    return (slice(None),
+            slice(max(rows[0] - margin, 0), min(rows[-1] + 1 + margin, height)),
+            slice(max(columns[0] - margin, 0), min(columns[-1] + 1 + margin, width)))
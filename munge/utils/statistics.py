@@ -0,0 +1,72 @@
+"""ROI statistics util functions working on stacks of images and masks"""
+import warnings
+
+import numpy as np
+
+DEFAULT_PERCENTILES = (5, 25, 75, 95)
+
+def get_roi_statistics(images, masks, spacing=None, percentiles=DEFAULT_PERCENTILES):
+    """
+    Computes the statistics of the ROI of every slice of the stack at once. Relative intensities are w.r.t the maximum
+    intensity of the whole slice, as in ``DataElement.get_roi_avg_relative_intensity``
+
+    :param images: stack of images of shape (N, H, W)
+    :param masks: boolean stack of ROI masks of shape (N, H, W)
+    :param spacing: optional (row, column) size of a pixel in mm, or array of shape (N, 2) with the spacing of every
+        slice. Without it ``area_sqmm`` is not computed
+    :param percentiles: percentiles of the intensities of the ROI to compute, in [0, 100]
+    :return: Dict of arrays of shape (N,) with ``area_pixels``, ``area_sqmm``, ``mean``, ``median``, ``p<q>`` for
+        every percentile, ``relative_mean`` and ``relative_median``. Intensities are NaN for slices with an empty ROI
+    """
+    images = np.asarray(images)
+    masks = np.asarray(masks, dtype=bool)
+    if images.shape != masks.shape:
+        raise ValueError('Images of shape {} and masks of shape {} do not match'.format(images.shape, masks.shape))
+
+    counts = np.count_nonzero(masks, axis=(1, 2))
+    maxima = images.max(axis=(1, 2)).astype(float) if images.size else np.zeros(len(images))
+
+    # the ROIs cover a small part of the images, so only the bounding box of all of them is read
+    rows = np.flatnonzero(masks.any(axis=(0, 2)))
+    columns = np.flatnonzero(masks.any(axis=(0, 1)))
+    if len(rows):
+        window = (slice(None), slice(rows[0], rows[-1] + 1), slice(columns[0], columns[-1] + 1))
+        values = np.where(masks[window], images[window], np.nan)
+    else:
+        values = np.full((len(images), 1, 1), np.nan)
+
+    quantiles = [50] + list(percentiles)
+    with warnings.catch_warnings():
+        # slices with an empty ROI are all NaN and get NaN statistics, as documented
+        warnings.simplefilter('ignore', RuntimeWarning)
+        means = np.nanmean(values, axis=(1, 2))
+        medians_and_percentiles = np.nanpercentile(values, quantiles, axis=(1, 2))
+
+    statistics = {
+        'area_pixels': counts,
+        'mean': means,
+        'median': medians_and_percentiles[0]
+    }
+    for q, values_at_q in zip(percentiles, medians_and_percentiles[1:]):
+        statistics['p{}'.format(q)] = values_at_q
+
+    if spacing is not None:
+        spacing = np.asarray(spacing, dtype=float)
+        statistics['area_sqmm'] = counts * spacing[..., 0] * spacing[..., 1]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        statistics['relative_mean'] = means / maxima * 100
+        statistics['relative_median'] = statistics['median'] / maxima * 100
+
+    return statistics
+
+def concatenate_tables(tables):
+    """
+    Concatenates the columns of the given tables, which must have the same columns
+
+    :param tables: list of Dicts of arrays
+    :return: Dict of arrays
+    """
+    if not tables:
+        return {}
+    return {column: np.concatenate([table[column] for table in tables]) for column in tables[0]}
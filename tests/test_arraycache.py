@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+
+from munge.ArrayCache import ArrayCache
+from munge.DataElement import DataElement
+
+paths = ['data/dicoms/SCD0000101/59.dcm',
+         'data/contourfiles/SC-HF-I-1/i-contours/IM-0001-0059-icontour-manual.txt',
+         'data/contourfiles/SC-HF-I-1/o-contours/IM-0001-0059-ocontour-manual.txt']
+
+def test_cached_element(tmpdir):
+    cache = ArrayCache(str(tmpdir))
+    element = DataElement(*paths)
+    cold_element = DataElement(*paths, cache=cache)
+    warm_element = DataElement(*paths, cache=cache)
+
+    assert len(os.listdir(str(tmpdir))) == 3
+    for cached_element in [cold_element, warm_element]:
+        assert np.array_equal(cached_element.image, element.image)
+        assert np.array_equal(cached_element.target, element.target)
+        assert np.array_equal(cached_element.ocontour_mask, element.ocontour_mask)
+        assert cached_element.dcm_image['resolution'] == element.dcm_image['resolution']
+
+def test_invalidation_and_eviction(tmpdir):
+    source = tmpdir.join('source.txt')
+    source.write('1')
+
+    cache = ArrayCache(str(tmpdir.mkdir('cache')))
+    cache.put(str(source), 'test', {'data': np.zeros(10)})
+    assert cache.get(str(source), 'test') is not None
+
+    source.write('12')
+    assert cache.get(str(source), 'test') is None
+
+    cache.put(str(source), 'test', {'data': np.ones(10)})
+    cache.put(str(source), 'other', {'data': np.ones(1000)})
+    assert len(os.listdir(cache.cache_dir)) == 2
+
+    # age both entries so that the access below makes 'test' the most recently used one
+    for entry in os.listdir(cache.cache_dir):
+        os.utime(os.path.join(cache.cache_dir, entry), (0, 0))
+    cache.get(str(source), 'test')
+    cache.evict(cache.size() - 1)
+    assert cache.get(str(source), 'other') is None
+    assert np.array_equal(cache.get(str(source), 'test')['data'], np.ones(10))
+
+    cache.invalidate(str(source))
+    assert cache.size() == 0
+
+def test_size_limit(tmpdir):
+    sources = []
+    for i in range(10):
+        source = tmpdir.join('source{}.txt'.format(i))
+        source.write(str(i))
+        sources.append(str(source))
+
+    cache = ArrayCache(str(tmpdir.mkdir('cache')), max_size=5000)
+    for source in sources:
+        cache.put(source, 'test', {'data': np.zeros(100)})
+        assert cache.size() <= 5000
+        assert cache._size == cache.size()
+
+    # the most recent entries are kept
+    assert cache.get(sources[-1], 'test') is not None
+    assert cache.get(sources[0], 'test') is None
@@ -0,0 +1,38 @@
+import numpy as np
+
+from munge.CroppedMask import CroppedMask
+from munge.DataElement import DataElement
+from munge.utils import contour
+
+paths = ['data/dicoms/SCD0000101/59.dcm',
+         'data/contourfiles/SC-HF-I-1/i-contours/IM-0001-0059-icontour-manual.txt',
+         'data/contourfiles/SC-HF-I-1/o-contours/IM-0001-0059-ocontour-manual.txt']
+
+def test_from_polygon():
+    for polygon in [contour.parse_contour_file(paths[2]), np.array([(-10.5, 3.2), (40.7, -8.1), (20.2, 30.9)])]:
+        mask = contour.poly_to_mask(polygon, 256, 256)
+        roi = CroppedMask.from_polygon(polygon, 256, 256)
+
+        assert np.array_equal(roi.toarray(), mask)
+        assert roi.sum() == mask.sum()
+        assert roi.bitmap.size < mask.size
+
+def test_packed_roundtrip():
+    mask = contour.poly_to_mask(contour.parse_contour_file(paths[1]), 256, 256)
+
+    for packed in [False, True]:
+        roi = CroppedMask.from_dense(mask, packed=packed)
+        assert np.array_equal(roi.toarray(), mask)
+        assert np.array_equal(CroppedMask.from_arrays(roi.to_arrays()).toarray(), mask)
+
+    assert CroppedMask.from_dense(mask, packed=True).nbytes < CroppedMask.from_dense(mask).nbytes
+    assert CroppedMask.from_dense(np.zeros((8, 8), dtype=bool)).sum() == 0
+
+def test_roi_access():
+    element = DataElement(*paths)
+    roi = element.ocontour_roi
+
+    assert np.array_equal(roi.values(element.image), element.image[element.ocontour_mask])
+    assert np.array_equal(roi.window(slice(100, 160), slice(-300, 140)), element.ocontour_mask[100:160, -300:140])
+    assert np.array_equal(roi.select(roi.crop(element.image) > 100).toarray(),
+                          element.ocontour_mask & (element.image > 100))
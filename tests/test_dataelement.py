@@ -24,3 +24,51 @@ def test_overlay_contours():
                           'data/contourfiles/SC-HF-I-1/o-contours/IM-0001-0059-ocontour-manual.txt')
     contours = element.overlay_contours()
     assert contours.shape[-1] == 3
+
+def test_lazy_element():
+    paths = ['data/dicoms/SCD0000101/59.dcm',
+             'data/contourfiles/SC-HF-I-1/i-contours/IM-0001-0059-icontour-manual.txt',
+             'data/contourfiles/SC-HF-I-1/o-contours/IM-0001-0059-ocontour-manual.txt']
+    element = DataElement(*paths, lazy=True)
+    assert element._dcm_image is None and element._target is None
+
+    eager_element = DataElement(*paths)
+    assert np.array_equal(element.target, eager_element.target)
+    assert np.array_equal(element.ocontour_mask, eager_element.ocontour_mask)
+
+    element.release()
+    assert element._dcm_image is None
+    assert np.array_equal(element.image, eager_element.image)
+
+def test_header():
+    paths = ['data/dicoms/SCD0000101/59.dcm',
+             'data/contourfiles/SC-HF-I-1/i-contours/IM-0001-0059-icontour-manual.txt',
+             'data/contourfiles/SC-HF-I-1/o-contours/IM-0001-0059-ocontour-manual.txt']
+    element = DataElement(*paths, lazy=True)
+
+    header = element.header
+    assert element._dcm_image is None
+    assert element.target.shape == (header['width'], header['height'])
+    assert element._dcm_image is None
+
+    assert header['width'] == element.dcm_image['width'] and header['height'] == element.dcm_image['height']
+    assert header['resolution'] == element.dcm_image['resolution']
+
+def test_missing_ocontour_statistics():
+    element = DataElement('data/dicoms/SCD0000101/48.dcm',
+                          'data/contourfiles/SC-HF-I-1/i-contours/IM-0001-0048-icontour-manual.txt',
+                          'data/contourfiles/SC-HF-I-1/o-contours/IM-0001-0048-ocontour-manual.txt')
+    assert not element.has_ocontour
+    assert np.isnan(element.get_roi_avg_relative_intensity('ocontour'))
+    assert np.isnan(element.get_area_in_sqmm('ocontour'))
+
+def test_header_of_decoded_image():
+    paths = ['data/dicoms/SCD0000101/59.dcm',
+             'data/contourfiles/SC-HF-I-1/i-contours/IM-0001-0059-icontour-manual.txt',
+             'data/contourfiles/SC-HF-I-1/o-contours/IM-0001-0059-ocontour-manual.txt']
+    element = DataElement(*paths)
+
+    # the eager element decoded its image, the masks and areas don't read the header from the file again
+    assert element._header is None
+    assert element.get_area_in_sqmm() > 0 and element.get_area_in_sqmm('ocontour') > 0
+    assert element._header is None
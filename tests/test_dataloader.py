@@ -26,3 +26,49 @@ def test_plot_random_epoch():
     train_data = data_loader.load_train_data()
     data_loader.plot_random_epoch(train_data, epoch_size=10, filename=plot_path)
     assert Path(plot_path).is_file()
+
+def test_iter_batches():
+    lazy_loader = DataLoader(Dataset('config.json', lazy=True))
+    batches = [batch for batch in lazy_loader.iter_batches(epochs=2, batch_size=10)]
+    assert len(batches) == 20 # 96 images in batches of 10 is 10 batches per epoch
+
+    images, masks = batches[0]
+    assert images.shape == masks.shape == (10,) + all_data[0].image.shape
+    assert masks.dtype == bool
+    assert batches[-1][0].shape[0] == 6
+
+    batches = [batch for batch in lazy_loader.iter_batches(epochs=1, batch_size=10, shuffle=False, drop_last=True)]
+    assert len(batches) == 9
+    assert np.array_equal(batches[0][0][0], all_data[0].image)
+
+def test_iter_memmap_batches(tmpdir):
+    memmap_loader = DataLoader(dataset.export(str(tmpdir)))
+    images, masks = next(memmap_loader.iter_batches(batch_size=8, shuffle=False))
+    assert images.shape[0] == 8
+    assert np.array_equal(masks[3], all_data[3].target)
+
+def test_prefetched_batches():
+    lazy_dataset = Dataset('config.json', lazy=True)
+
+    for backend in ['thread', 'process']:
+        prefetch_loader = DataLoader(lazy_dataset, num_workers=2, prefetch=3, backend=backend)
+        batches = [batch for batch in prefetch_loader.iter_batches(epochs=1, batch_size=8, shuffle=False)]
+
+        assert len(batches) == 12
+        assert np.array_equal(batches[1][1][0], all_data[8].target)
+        assert prefetch_loader.stats['batches'] == 12
+        assert prefetch_loader.stats['busy_time'] > 0
+        assert 0 <= prefetch_loader.stats['queue_depth'] <= 4
+
+def test_prefetched_lazy_epochs():
+    # shuffled batches of consecutive epochs are loaded at the same time and often have slices in common
+    lazy_dataset = Dataset('config.json', lazy=True)
+    prefetch_loader = DataLoader(lazy_dataset, num_workers=2, prefetch=3, backend='thread')
+
+    batches = [batch for batch in prefetch_loader.iter_batches(epochs=3, batch_size=8)]
+    assert len(batches) == 36
+
+    targets = [element.target for element in all_data]
+    for images, masks in batches:
+        assert images.shape == masks.shape == (8,) + all_data[0].image.shape
+        assert all(any(np.array_equal(mask, target) for target in targets) for mask in masks)
@@ -44,3 +44,75 @@ def test_plot_for_study():
     plot_path = 'tests/tmp/plot.png'
     dataset.plot_verification_for_study('SCD0000501', plot_path)
     assert Path(plot_path).is_file()
+
+def test_get_all_streaming():
+    streaming_dataset = Dataset('config.json')
+    first = next(streaming_dataset.get_all())
+    assert isinstance(first, DataElement)
+    assert streaming_dataset.current_dataset is None
+
+    cached = [e for e in streaming_dataset.get_all(cache=True)]
+    assert streaming_dataset.current_dataset == cached
+    assert [e for e in streaming_dataset.get_all(cache=True)] == cached
+
+def test_parallel_loading():
+    for backend in ['thread', 'process']:
+        parallel_dataset = Dataset('config.json', workers=4, backend=backend)
+        study_data = [e for e in parallel_dataset.get_by_study('SCD0000101')]
+        serial_data = [e for e in dataset.get_by_study('SCD0000101')]
+
+        assert [e.icontour_path for e in study_data] == [e.icontour_path for e in serial_data]
+        assert all(np.array_equal(p.target, s.target) for p, s in zip(study_data, serial_data))
+
+def test_parse_contour_dir():
+    contour_dir = 'data/contourfiles/SC-HF-I-1/i-contours/'
+    filenames, coords, offsets = contour.parse_contour_dir(contour_dir)
+
+    assert len(filenames) == len(offsets) - 1 == 18
+    for i in [0, 7, 17]:
+        contour_content = contour.parse_contour_file(contour_dir + filenames[i])
+        assert contour_content.shape[1] == 2
+        assert np.array_equal(coords[offsets[i]:offsets[i + 1]], contour_content)
+
+def test_poly_to_mask_matches_pil():
+    from PIL import Image, ImageDraw
+
+    for contour_dir in ['data/contourfiles/SC-HF-I-1/i-contours/', 'data/contourfiles/SC-HF-I-1/o-contours/']:
+        filenames, coords, offsets = contour.parse_contour_dir(contour_dir)
+        polygons = [coords[offsets[i]:offsets[i + 1]] for i in range(len(filenames))]
+
+        masks = contour.polys_to_masks(polygons, 256, 256)
+        assert masks.shape == (len(polygons), 256, 256)
+
+        for polygon, mask in zip(polygons, masks):
+            img = Image.new(mode='L', size=(256, 256), color=0)
+            ImageDraw.Draw(img).polygon(xy=polygon.ravel().tolist(), outline=0, fill=1)
+            assert np.array_equal(mask, np.array(img).astype(bool))
+            assert np.array_equal(contour.poly_to_mask(polygon, 256, 256), mask)
+
+    clipped = contour.poly_to_mask([(-10.5, -10.5), (300.2, 5.7), (120.9, 310.3)], 256, 256)
+    img = Image.new(mode='L', size=(256, 256), color=0)
+    ImageDraw.Draw(img).polygon(xy=[-10.5, -10.5, 300.2, 5.7, 120.9, 310.3], outline=0, fill=1)
+    assert np.array_equal(clipped, np.array(img).astype(bool))
+
+def test_random_access():
+    lazy_dataset = Dataset('config.json', lazy=True)
+    assert len(lazy_dataset) == len(all_data) == 96
+
+    element = lazy_dataset[('SCD0000101', 59)]
+    assert element.icontour_path == 'data/contourfiles/SC-HF-I-1/i-contours/IM-0001-0059-icontour-manual.txt'
+    assert lazy_dataset[element.id].icontour_path == element.icontour_path
+
+    # ids are derived from the contour paths, so they are the same in every run
+    assert Dataset('config.json')[element.id].dcm_num == 59
+
+    positions = [lazy_dataset[i].icontour_path for i in range(len(lazy_dataset))]
+    assert positions == [e.icontour_path for e in dataset.get_all()]
+    assert lazy_dataset[-1].icontour_path == positions[-1]
+
+def test_create_elements():
+    mappings = list(dataset.index.get_study('SCD0000101'))[:3]
+    elements = list(dataset.create_elements(mappings, lazy=True))
+
+    assert [element.id for element in elements] == [mapping['id'] for mapping in mappings]
+    assert all(element.lazy and element._dcm_image is None for element in elements)
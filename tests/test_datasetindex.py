@@ -0,0 +1,59 @@
+import json
+import os
+
+from munge.Dataset import Dataset
+from munge.DatasetIndex import DatasetIndex
+from munge.utils import image, misc
+
+config = misc.get_app_config('config.json')
+
+def test_index():
+    index = DatasetIndex(config)
+    assert len(index) == 96
+    assert len(index.get_study('SCD0000101')) == 18
+
+    mapping = index.get_slice('SCD0000101', 59)
+    assert mapping['dicom_path'] == 'data/dicoms/SCD0000101/59.dcm'
+    assert mapping['icontour_path'] == 'data/contourfiles/SC-HF-I-1/i-contours/IM-0001-0059-icontour-manual.txt'
+    assert mapping['ocontour_path'] == 'data/contourfiles/SC-HF-I-1/o-contours/IM-0001-0059-ocontour-manual.txt'
+    assert index.get_slice('SCD0000101', 48)['ocontour_path'] is None
+
+def test_persisted_index(tmpdir):
+    link_path = str(tmpdir.join('link.csv'))
+    with open('data/link.csv') as link_file:
+        lines = link_file.readlines()
+    with open(link_path, 'w') as link_file:
+        link_file.writelines(lines[:2])
+
+    index_config = dict(config, link_file_path=link_path)
+    index_path = str(tmpdir.join('index.json'))
+
+    index = DatasetIndex(index_config, index_path)
+    assert not index.loaded and os.path.isfile(index_path)
+
+    loaded_index = DatasetIndex(index_config, index_path)
+    assert loaded_index.loaded and not loaded_index.is_stale()
+    assert list(loaded_index) == list(index)
+
+    # adding a study to the link file makes the persisted index stale
+    with open(link_path, 'w') as link_file:
+        link_file.writelines(lines[:3])
+    os.utime(link_path, ns=(0, 0))
+
+    rebuilt_index = DatasetIndex(index_config, index_path)
+    assert not rebuilt_index.loaded and len(rebuilt_index.patient_ids) == 2
+    with open(index_path) as index_file:
+        assert len(json.load(index_file)['studies']) == 2
+
+def test_dataset_index(tmpdir):
+    dataset = Dataset('config.json', lazy=True, index_path=str(tmpdir.join('index.json')))
+    assert [e.icontour_path for e in dataset.get_by_study('SCD0000101')] == \
+           [m['icontour_path'] for m in dataset.index.get_study('SCD0000101')]
+
+def test_index_headers():
+    mapping = DatasetIndex(config).get_slice('SCD0000101', 59)
+    assert mapping['header'] == image.parse_dicom_header(mapping['dicom_path'])
+
+    dcm_image = image.parse_dicom_file(mapping['dicom_path'])
+    assert (mapping['header']['width'], mapping['header']['height']) == dcm_image['pixel_data'].shape
+    assert mapping['header']['resolution'] == dcm_image['resolution']
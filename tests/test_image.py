@@ -0,0 +1,51 @@
+import numpy as np
+
+from munge.DataElement import DataElement
+from munge.utils import image, misc
+
+def test_grayscale_to_rgb():
+    img = image.parse_dicom_file('data/dicoms/SCD0000101/59.dcm')['pixel_data']
+    expected = np.repeat(img.astype(np.uint8)[..., None], 3, 2)
+
+    rgb = image.grayscale_to_rgb(img)
+    assert np.array_equal(rgb, expected)
+    assert not rgb.flags.writeable
+
+    out = np.empty(img.shape + (3,), dtype=np.uint8)
+    assert image.grayscale_to_rgb(img, out=out) is out
+    assert np.array_equal(out, expected)
+
+def test_to_uint8_levels():
+    img = np.array([[-10, 0, 50], [100, 200, 25]])
+    assert np.array_equal(image.to_uint8(img, levels=(0, 100)), [[0, 0, 128], [255, 255, 64]])
+    assert np.array_equal(image.to_uint8(img, levels='auto'), image.to_uint8(img, levels=(-10, 200)))
+    assert np.array_equal(image.to_uint8(np.full((2, 2), 7), levels='auto'), np.zeros((2, 2)))
+
+def test_overlay_masks_batch():
+    images = np.random.randint(0, 1000, size=(4, 32, 32))
+    masks = np.random.rand(4, 32, 32) > 0.5
+    out = np.empty((4, 32, 32, 3), dtype=np.uint8)
+
+    assert image.overlay_masks(images, [(masks, [255, 0, 0])], levels='auto', out=out) is out
+
+    expected = np.repeat(image.to_uint8(images, levels='auto')[..., None], 3, 3)
+    expected[masks] = [255, 0, 0]
+    assert np.array_equal(out, expected)
+
+def test_element_overlay():
+    element = DataElement('data/dicoms/SCD0000101/59.dcm',
+                          'data/contourfiles/SC-HF-I-1/i-contours/IM-0001-0059-icontour-manual.txt',
+                          'data/contourfiles/SC-HF-I-1/o-contours/IM-0001-0059-ocontour-manual.txt')
+
+    min_x, max_x, min_y, max_y = misc.get_bounding_box_coords(element.ocontour, 30)
+    rgb = image.grayscale_to_rgb(element.image, levels='auto')[min_x:max_x, min_y:max_y]
+    painted = rgb.copy()
+    painted[element.ocontour_mask[min_x:max_x, min_y:max_y]] = [0, 0, 255]
+    painted[element.target[min_x:max_x, min_y:max_y]] = [255, 0, 0]
+
+    overlay = element.overlay_contours()
+    assert np.array_equal(overlay, np.hstack([rgb, painted]))
+
+    out = np.zeros_like(overlay)
+    assert element.overlay_contours(out=out) is out
+    assert np.array_equal(out, overlay)
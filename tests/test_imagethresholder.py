@@ -1,4 +1,5 @@
 from pathlib import Path
+import numpy as np
 
 from munge.DataElement import DataElement
 from munge.ImageThresholder import ImageThresholder
@@ -17,3 +18,91 @@ def test_imagethresholder():
     thresholding_result_path = 'tests/tmp/thresholding_result.png'
     thresholder.plot_thresholding_result(thresholding_result_path)
     assert Path(thresholding_result_path).is_file()
+
+def test_threshold_elements():
+    from munge.Dataset import Dataset
+
+    elements = [e for e in Dataset('config.json').get_by_study('SCD0000101') if e.has_ocontour]
+    result = ImageThresholder.threshold_elements(elements, n_components=2, workers=2, backend='process')
+
+    assert result['ids'] == [e.id for e in elements]
+    assert result['thresholds'].shape == (len(elements),)
+    assert result['means'].shape == result['weights'].shape == (len(elements), 2)
+    assert result['masks'].shape == (len(elements),) + elements[0].image.shape
+
+    for element, threshold, mask in zip(elements, result['thresholds'], result['masks']):
+        assert not (mask & ~element.ocontour_mask).any()
+        assert np.array_equal(mask, element.ocontour_mask & (element.image > threshold))
+
+def test_em_parity():
+    for dcm_num in [59, 79, 139]:
+        element = DataElement('data/dicoms/SCD0000101/{}.dcm'.format(dcm_num),
+                              'data/contourfiles/SC-HF-I-1/i-contours/IM-0001-{:04d}-icontour-manual.txt'.format(dcm_num),
+                              'data/contourfiles/SC-HF-I-1/o-contours/IM-0001-{:04d}-ocontour-manual.txt'.format(dcm_num))
+
+        gmm_thresholder = ImageThresholder(element, n_components=2, method='gmm')
+        gmm_thresholder.get_thresholded_contour_mask()
+
+        em_thresholder = ImageThresholder(element, n_components=2, method='em')
+        em_thresholder.get_thresholded_contour_mask()
+
+        intensity_range = em_thresholder.masked_image.max() - em_thresholder.masked_image.min()
+        assert abs(em_thresholder.threshold - gmm_thresholder.threshold) < 0.02 * intensity_range
+        assert np.allclose(em_thresholder.model['weights'].sum(), 1)
+
+        warm_thresholder = ImageThresholder(element, n_components=2, method='em',
+                                            init=[em_thresholder.model[p] for p in ['means', 'variances', 'weights']])
+        warm_thresholder.get_thresholded_contour_mask()
+        assert abs(warm_thresholder.threshold - em_thresholder.threshold) < 0.01 * intensity_range
+
+def test_auto_components():
+    element = DataElement('data/dicoms/SCD0000201/80.dcm',
+                          'data/contourfiles/SC-HF-I-2/i-contours/IM-0001-0080-icontour-manual.txt',
+                          'data/contourfiles/SC-HF-I-2/o-contours/IM-0001-0080-ocontour-manual.txt')
+
+    for criterion in ['bic', 'aic']:
+        thresholder = ImageThresholder(element, n_components='auto', method='em', criterion=criterion, workers=2)
+        thresholder.get_thresholded_contour_mask()
+        assert thresholder.selected_components in [2, 3]
+
+        # every candidate is fitted once and the later calls reuse the fits
+        fits = dict(thresholder._fits)
+        thresholder.plot_model_fit('tests/tmp/model_fit_auto.png')
+        thresholder.get_jaccard_coeff()
+        assert all(thresholder._fits['em', count] is fits['em', count] for count in [2, 3])
+
+    result = ImageThresholder.threshold_elements([element], n_components='auto', method='em')
+    assert result['n_components'][0] in [2, 3]
+    assert result['means'].shape == (1, result['n_components'].max())
+
+def test_memoized_results():
+    element = DataElement('data/dicoms/SCD0000101/59.dcm',
+                          'data/contourfiles/SC-HF-I-1/i-contours/IM-0001-0059-icontour-manual.txt',
+                          'data/contourfiles/SC-HF-I-1/o-contours/IM-0001-0059-ocontour-manual.txt')
+    thresholder = ImageThresholder(element, n_components=2, method='em', postprocess=True)
+
+    processed_mask = thresholder.get_thresholded_contour_mask()
+    thresholder.plot_thresholding_result('tests/tmp/thresholding_result_memo.png')
+    assert thresholder.get_thresholded_contour_mask() is processed_mask
+    assert len(thresholder._fits) == len(thresholder._results) == 1
+
+    thresholder.postprocess = False
+    mask = thresholder.get_thresholded_contour_mask()
+    assert mask is not processed_mask and not (mask & ~processed_mask).any()
+    assert len(thresholder._fits) == 1
+
+    thresholder.n_components = 3
+    thresholder.get_thresholded_contour_mask()
+    assert len(thresholder._results) == 2
+
+    thresholder.invalidate()
+    assert not thresholder._fits and not thresholder._results
+
+def test_missing_ocontour():
+    import pytest
+
+    element = DataElement('data/dicoms/SCD0000101/48.dcm',
+                          'data/contourfiles/SC-HF-I-1/i-contours/IM-0001-0048-icontour-manual.txt',
+                          'data/contourfiles/SC-HF-I-1/o-contours/IM-0001-0048-ocontour-manual.txt')
+    with pytest.raises(ValueError):
+        ImageThresholder(element)
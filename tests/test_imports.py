@@ -0,0 +1,32 @@
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ['matplotlib', 'sklearn', 'SimpleITK', 'scipy.stats']
+
+def _import_in_subprocess(modules):
+    """Imports the modules in a fresh interpreter and returns the time taken and the heavy modules it pulled in"""
+    code = '''
+import json, sys, time
+start = time.perf_counter()
+{}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'time': elapsed, 'heavy': [m for m in {} if m in sys.modules]}}))
+'''.format('\n'.join('import ' + module for module in modules), HEAVY_MODULES)
+
+    output = subprocess.check_output([sys.executable, '-c', code])
+    return json.loads(output.decode().splitlines()[-1])
+
+def test_loading_imports_are_light():
+    result = _import_in_subprocess(['munge.Dataset', 'munge.DataElement', 'munge.DataLoader', 'munge.MemmapDataset'])
+    assert result['heavy'] == []
+
+def test_thresholder_imports_are_light():
+    result = _import_in_subprocess(['munge.ImageThresholder', 'munge.SegmentationEvaluator'])
+    assert result['heavy'] == []
+
+def test_import_time():
+    # benchmark of a worker process start-up, the heavy modules alone take longer than the whole loading stack
+    light = min(_import_in_subprocess(['munge.Dataset', 'munge.DataLoader'])['time'] for _ in range(3))
+    heavy = min(_import_in_subprocess(['matplotlib.pyplot', 'sklearn.mixture'])['time'] for _ in range(3))
+    assert light < heavy
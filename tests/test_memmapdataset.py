@@ -0,0 +1,28 @@
+import numpy as np
+
+from munge.Dataset import Dataset
+from munge.MemmapDataset import MemmapDataset
+
+def test_export(tmpdir):
+    dataset = Dataset('config.json')
+    exported = dataset.export(str(tmpdir))
+    loaded = MemmapDataset(str(tmpdir))
+
+    all_data = [e for e in dataset.get_all()]
+    assert len(loaded) == len(all_data) == len(exported)
+    assert isinstance(loaded.images, np.memmap)
+
+    for i in [0, 10, len(all_data) - 1]:
+        element = all_data[i]
+        assert loaded.index[i]['icontour_path'] == element.icontour_path
+        assert loaded.index[i]['dcm_num'] == element.dcm_num
+        assert np.array_equal(loaded.images[i], element.image)
+        assert np.array_equal(loaded.targets[i], element.target)
+        if element.has_ocontour:
+            assert np.array_equal(loaded.ocontour_masks[i], element.ocontour_mask)
+        else:
+            assert not loaded.ocontour_masks[i].any()
+
+    images, targets = loaded.get_batch(slice(0, 4))
+    assert images.shape == (4,) + all_data[0].image.shape
+    assert np.shares_memory(images, loaded.images)
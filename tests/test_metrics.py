@@ -0,0 +1,35 @@
+import numpy as np
+
+from munge.utils import metrics
+
+def test_overlap_measures():
+    reference = np.zeros((10, 10), dtype=bool)
+    reference[2:6, 2:6] = True
+    predicted = np.zeros((10, 10), dtype=bool)
+    predicted[4:8, 2:6] = True
+
+    measures = metrics.get_overlap_measures(reference, predicted)
+    assert np.isclose(measures['jaccard'], 8 / 24)
+    assert np.isclose(measures['dice'], 16 / 32)
+    assert np.isclose(measures['sensitivity'], 8 / 16)
+    assert np.isclose(measures['specificity'], 76 / 84)
+    assert metrics.jaccard_coeff(reference, predicted) == measures['jaccard']
+    assert metrics.dice_coeff(reference, predicted) == measures['dice']
+
+    batch = metrics.get_overlap_measures(np.stack([reference, reference, np.zeros_like(reference)]),
+                                         np.stack([predicted, reference, np.zeros_like(reference)]))
+    assert np.allclose(batch['jaccard'], [8 / 24, 1, 1])
+
+def test_distances():
+    reference = np.zeros((20, 20), dtype=bool)
+    reference[5:10, 5:10] = True
+    predicted = np.zeros((20, 20), dtype=bool)
+    predicted[5:10, 8:13] = True
+
+    assert metrics.hausdorff_distance(reference, reference) == 0
+    assert metrics.hausdorff_distance(reference, predicted) == 3
+    assert metrics.hausdorff_distance(reference, predicted, spacing=(1, 2)) == 6
+    assert 0 < metrics.mean_surface_distance(reference, predicted) < 3
+
+    distances = metrics.hausdorff_distance(np.stack([reference, reference]), np.stack([predicted, np.zeros_like(predicted)]))
+    assert distances[0] == 3 and np.isnan(distances[1])
@@ -0,0 +1,36 @@
+import numpy as np
+from scipy import ndimage
+
+from munge.utils import postprocessing
+
+def test_dilation_parity():
+    from skimage import morphology
+
+    np.random.seed(0)
+    masks = np.zeros((3, 64, 64), dtype=bool)
+    masks[:, 20:40, 25:45] = np.random.rand(3, 20, 20) > 0.5
+
+    processed = postprocessing.apply_pipeline(masks, True)
+    for mask, processed_mask in zip(masks, processed):
+        assert np.array_equal(processed_mask, morphology.binary_dilation(mask, morphology.disk(3)))
+        assert np.array_equal(postprocessing.apply_pipeline(mask, True), processed_mask)
+
+    assert not postprocessing.apply_pipeline(np.zeros((8, 8), dtype=bool), ['close', 'fill_holes']).any()
+
+def test_pipeline():
+    mask = np.zeros((32, 32), dtype=bool)
+    mask[5:15, 5:15] = True
+    mask[8:11, 8:11] = False
+    mask[25, 25] = True
+
+    processed = postprocessing.apply_pipeline(mask, ['fill_holes', 'largest_component'])
+    expected = np.zeros_like(mask)
+    expected[5:15, 5:15] = True
+    assert np.array_equal(processed, expected)
+
+    full = ndimage.binary_erosion(ndimage.binary_dilation(mask, structure=postprocessing.get_disk(2)),
+                                  structure=postprocessing.get_disk(2), border_value=1)
+    assert np.array_equal(postprocessing.apply_pipeline(mask, [('close', {'radius': 2})]), full)
+
+    batch = postprocessing.apply_pipeline(np.stack([mask, np.zeros_like(mask), mask]), ['largest_component'])
+    assert np.array_equal(batch[0], batch[2]) and not batch[1].any() and not batch[0][25, 25]
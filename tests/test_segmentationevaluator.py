@@ -0,0 +1,44 @@
+import json
+import os
+
+import numpy as np
+
+from munge.Dataset import Dataset
+from munge.SegmentationEvaluator import SegmentationEvaluator, _summarize
+from munge.utils import metrics
+
+def test_evaluate(tmpdir):
+    evaluator = SegmentationEvaluator(Dataset('config.json', lazy=True), method='em', postprocess=True, workers=2)
+    report = evaluator.evaluate(['SCD0000101', 'SCD0000201'], report_dir=str(tmpdir))
+
+    slices = report['slices']
+    assert len(slices) == report['global']['slices'] == sum(s['slices'] for s in report['studies'].values())
+    assert set(report['studies']) == {'SCD0000101', 'SCD0000201'}
+    assert all(0 <= s['jaccard'] <= 1 and s['time'] > 0 for s in slices)
+    assert report['throughput'] > 0
+
+    assert os.path.isfile(os.path.join(str(tmpdir), 'slices.csv'))
+    with open(os.path.join(str(tmpdir), 'report.json')) as report_file:
+        assert len(json.load(report_file)['slices']) == len(slices)
+
+def test_write_report_empty_prediction(tmpdir):
+    reference = np.zeros((10, 10), dtype=bool)
+    reference[3:7, 3:7] = True
+    predicted = np.zeros_like(reference)
+
+    record = {'id': 'empty', 'time': 0.1}
+    record.update(metrics.get_overlap_measures(reference, predicted))
+    record['hausdorff'] = metrics.hausdorff_distance(reference, predicted)
+    assert np.isnan(record['hausdorff'])
+
+    report = {'slices': [record], 'studies': {}, 'global': _summarize([record]), 'elapsed_time': 0.1,
+              'throughput': 10.0}
+    SegmentationEvaluator.write_report(report, str(tmpdir))
+
+    def reject(constant):
+        raise ValueError('Invalid JSON constant {}'.format(constant))
+
+    with open(os.path.join(str(tmpdir), 'report.json')) as report_file:
+        written = json.load(report_file, parse_constant=reject)
+    assert written['slices'][0]['hausdorff'] is None
+    assert written['global']['hausdorff']['mean'] is None
@@ -0,0 +1,40 @@
+import numpy as np
+
+from munge.Dataset import Dataset
+from munge.utils import statistics
+
+def test_get_roi_statistics():
+    images = np.random.randint(0, 1000, size=(3, 20, 20))
+    masks = np.zeros((3, 20, 20), dtype=bool)
+    masks[0, 2:5, 3:9] = True
+    masks[1, 10:18, 12:14] = True
+
+    table = statistics.get_roi_statistics(images, masks, spacing=(0.5, 2.0), percentiles=(25,))
+
+    for i in range(2):
+        values = images[i][masks[i]]
+        assert table['area_pixels'][i] == len(values)
+        assert table['area_sqmm'][i] == len(values)
+        assert np.isclose(table['mean'][i], values.mean())
+        assert np.isclose(table['median'][i], np.median(values))
+        assert np.isclose(table['p25'][i], np.percentile(values, 25))
+        assert np.isclose(table['relative_mean'][i], values.mean() / images[i].max() * 100)
+
+    assert table['area_pixels'][2] == 0 and np.isnan(table['mean'][2]) and np.isnan(table['median'][2])
+
+def test_dataset_roi_statistics():
+    dataset = Dataset('config.json', lazy=True)
+    table = dataset.get_roi_statistics(patient_ids=['SCD0000101'])
+
+    elements = sorted(dataset.get_by_study('SCD0000101'), key=lambda element: element.dcm_num)
+    assert list(table['id']) == [element.id for element in elements]
+    assert list(table['dcm_num']) == [element.dcm_num for element in elements]
+
+    assert np.allclose(table['icontour_area_sqmm'], [element.get_area_in_sqmm() for element in elements])
+    assert np.allclose(table['icontour_relative_mean'],
+                       [element.get_roi_avg_relative_intensity() for element in elements])
+
+    has_ocontour = np.array([element.has_ocontour for element in elements])
+    assert np.allclose(table['ocontour_relative_mean'][has_ocontour],
+                       [e.get_roi_avg_relative_intensity('ocontour') for e in elements if e.has_ocontour])
+    assert np.isnan(table['ocontour_area_sqmm'][~has_ocontour]).all()
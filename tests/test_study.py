@@ -0,0 +1,43 @@
+import numpy as np
+
+from munge.Dataset import Dataset
+
+dataset = Dataset('config.json', lazy=True)
+
+def test_study_volumes():
+    study = dataset.get_study('SCD0000101')
+    elements = sorted(dataset.get_by_study('SCD0000101'), key=lambda element: element.dcm_num)
+
+    assert len(study) == len(elements) == 18
+    assert list(study.dcm_nums) == [element.dcm_num for element in elements]
+    assert study.shape == (18,) + elements[0].image.shape
+    assert study.spacing == elements[0].dcm_image['resolution']
+
+    assert np.array_equal(study.images, [element.image for element in elements])
+    assert np.array_equal(study.targets, [element.target for element in elements])
+    assert all(np.array_equal(study.ocontour_masks[i], element.ocontour_mask)
+               for i, element in enumerate(elements) if element.has_ocontour)
+
+def test_lazy_slices():
+    study = dataset.get_study('SCD0000101')
+    positions = study.get_positions([59, 79])
+
+    images, targets = study.get_slices(positions)
+    assert list(study.images_loaded.nonzero()[0]) == list(positions)
+    assert np.array_equal(images[0], dataset[('SCD0000101', 59)].image)
+    assert np.array_equal(targets[1], dataset[('SCD0000101', 79)].target)
+
+    # masks are loaded without decoding the images
+    study.get_masks('ocontour')
+    assert study.masks_loaded.all() and study.images_loaded.sum() == 2
+
+def test_study_metrics():
+    study = dataset.get_study('SCD0000101')
+    elements = sorted(dataset.get_by_study('SCD0000101'), key=lambda element: element.dcm_num)
+
+    intensities = [element.get_roi_avg_relative_intensity() for element in elements]
+    assert np.allclose(study.get_relative_intensities(), intensities)
+
+    areas = [element.target.sum() * np.prod(element.dcm_image['resolution']) for element in elements]
+    assert np.allclose(study.get_areas(), areas)
+    assert np.isnan(study.get_areas('ocontour')[~study.has_ocontour]).all()
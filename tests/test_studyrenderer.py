@@ -0,0 +1,31 @@
+import numpy as np
+
+from munge.Dataset import Dataset
+from munge.StudyRenderer import StudyRenderer
+
+def test_render_sheet():
+    dataset = Dataset('config.json', lazy=True)
+    renderer = StudyRenderer(dataset, columns=4, spacing=2)
+
+    sheet, positions = renderer.render_sheet('SCD0000101')
+    assert sheet.dtype == np.uint8 and sheet.shape[-1] == 3
+    assert [dcm_num for _, _, dcm_num in positions] == sorted(e.dcm_num for e in dataset.get_by_study('SCD0000101'))
+
+    # every slice is pasted at its position, the first one at the top left corner
+    element = dataset[('SCD0000101', positions[0][2])]
+    overlay = element.get_image_icontour_overlay()
+    assert np.array_equal(sheet[:overlay.shape[0], :overlay.shape[1]], overlay)
+
+def test_write_sheets(tmpdir):
+    from PIL import Image
+
+    dataset = Dataset('config.json', lazy=True)
+    renderer = StudyRenderer(dataset, workers=2, labels=False)
+
+    filenames = renderer.write_sheets(str(tmpdir), ['SCD0000101', 'SCD0000201'])
+    assert [f.split('/')[-1] for f in filenames] == ['SCD0000101.png', 'SCD0000201.png']
+
+    sheet, _ = renderer.render_sheet('SCD0000101')
+    written = np.array(Image.open(filenames[0]).convert('RGB'))
+    assert written.shape == sheet.shape
+    assert np.array_equal(written, sheet)